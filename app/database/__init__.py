@@ -1,7 +1,35 @@
-from app.database.tinydb_manager import DatabaseManager
+import threading
+from typing import TYPE_CHECKING
+
 from settings import DATABASE_PATH
 
-db = DatabaseManager(DATABASE_PATH)
+if TYPE_CHECKING:
+    from app.database.tinydb_manager import DatabaseManager
+
+    db: DatabaseManager
+
+_db = None
+_db_lock = threading.Lock()
+
+
+def __getattr__(name: str):
+    # The database is opened on first access instead of at import time
+    global _db
+    if name == "db":
+        if _db is None:
+            with _db_lock:
+                if _db is None:
+                    from app.database.tinydb_manager import DatabaseManager
+
+                    _db = DatabaseManager(DATABASE_PATH)
+        return _db
+    if name == "DatabaseManager":
+        from app.database.tinydb_manager import DatabaseManager
+
+        return DatabaseManager
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
+
 
 __all__ = [
     "DatabaseManager",
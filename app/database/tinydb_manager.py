@@ -12,12 +12,15 @@ from typing import Any
 from uuid import UUID
 
 from tinydb import Query, TinyDB
+from tinydb.middlewares import CachingMiddleware
+from tinydb.storages import JSONStorage
 
 from app.models.database import (
     AppearanceModel,
     ServerModel,
     SettingsModel,
     SubscriptionModel,
+    normalize_id,
 )
 from settings import DATA_DIR
 
@@ -69,6 +72,12 @@ def get_default_xray_binary_filename() -> str:
     return "xray"
 
 
+class WriteThroughCache(CachingMiddleware):
+    """Serve reads from memory and write every change straight to disk."""
+
+    WRITE_CACHE_SIZE = 1
+
+
 class DatabaseManager:
     """Manages TinyDB operations for subscriptions, servers, and settings."""
 
@@ -76,11 +85,14 @@ class DatabaseManager:
         """Initialize the database manager."""
         self.db_path = db_path
         self._lock = threading.RLock()  # Reentrant lock for thread safety
+        # server_id -> (subscription_id, remarks, status), kept in step with every subscription write
+        self._server_index: dict[str, tuple[str, str, str]] = {}
 
         # Ensure database directory exists
         os.makedirs(os.path.dirname(os.path.abspath(str(db_path))), exist_ok=True)
 
-        self.db = TinyDB(db_path, indent=2)
+        # Keep the parsed file in memory instead of re-reading it on every query
+        self.db = TinyDB(db_path, indent=2, storage=WriteThroughCache(JSONStorage))
 
         # Get tables
         self.subscriptions_table = self.db.table("subscriptions")
@@ -89,6 +101,8 @@ class DatabaseManager:
         # Initialize settings if not exists
         self._init_settings()
         self._init_appearance()
+        self._migrate_ids()
+        self._build_server_index()
 
     @contextmanager
     def _db_operation(self):
@@ -130,13 +144,58 @@ class DatabaseManager:
         """Ensure appearance are initialized by delegating to get_appearance()."""
         self.get_appearance()
 
+    def _migrate_ids(self) -> None:
+        """Rewrite ids stored in the old dashed UUID format as 32-char hex."""
+        with self._db_operation():
+            for doc in self.subscriptions_table.all():
+                servers = doc.get("servers") or []
+                ids = [doc.get("id"), *(server.get("id") for server in servers)]
+                if not any(isinstance(id_, str) and "-" in id_ for id_ in ids):
+                    continue
+
+                self.subscriptions_table.update(
+                    {
+                        "id": normalize_id(doc.get("id")),
+                        "servers": [{**server, "id": normalize_id(server.get("id"))} for server in servers],
+                    },
+                    doc_ids=[doc.doc_id],
+                )
+
+    def _build_server_index(self) -> None:
+        """Index every stored server by id."""
+        with self._db_operation():
+            self._server_index.clear()
+            for doc in self.subscriptions_table.all():
+                for server in doc.get("servers") or []:
+                    self._server_index[server["id"]] = (
+                        doc["id"],
+                        server.get("remarks", ""),
+                        server.get("status", "stopped"),
+                    )
+
+    def _index_servers(self, subscription_id: str, servers: list[ServerModel]) -> None:
+        """Replace the index entries of a subscription with its current servers."""
+        stale = [server_id for server_id, entry in self._server_index.items() if entry[0] == subscription_id]
+        for server_id in stale:
+            del self._server_index[server_id]
+        for server in servers:
+            self._server_index[server.id] = (subscription_id, server.remarks, server.status)
+
+    def find_server(self, server_id: str) -> tuple[str, str, str] | None:
+        """Look up (subscription_id, remarks, status) of a server without loading subscriptions."""
+        with self._db_operation():
+            return self._server_index.get(server_id)
+
     def _serialize_for_db(self, data: dict[str, Any]) -> dict[str, Any]:
         """Serialize data for database storage with Windows path safety."""
         if isinstance(data, dict):
             result = {}
             for key, value in data.items():
-                if isinstance(value, UUID):
-                    result[key] = str(value)
+                if key == "raw":
+                    # Server configs came from JSON and are stored as they are, without a rebuild
+                    result[key] = value
+                elif isinstance(value, UUID):
+                    result[key] = value.hex
                 elif isinstance(value, datetime):
                     result[key] = value.isoformat()
                 elif isinstance(value, Path):
@@ -162,11 +221,10 @@ class DatabaseManager:
         if isinstance(data, dict):
             result = {}
             for key, value in data.items():
-                if key in ["id"] and isinstance(value, str):
-                    try:
-                        result[key] = UUID(value)
-                    except ValueError:
-                        result[key] = value
+                if key == "raw":
+                    # Server configs are plain JSON, nothing in them needs converting back; the
+                    # model hands them out read-only, so the cached document is not copied either
+                    result[key] = value
                 elif key in ["last_updated"] and isinstance(value, str):
                     try:
                         result[key] = datetime.fromisoformat(value)
@@ -209,13 +267,14 @@ class DatabaseManager:
         with self._db_operation():
             data = self._serialize_for_db(subscription.model_dump())
             self.subscriptions_table.insert(data)
+            self._index_servers(subscription.id, subscription.servers)
             return subscription
 
-    def get_subscription(self, subscription_id: UUID) -> SubscriptionModel | None:
+    def get_subscription(self, subscription_id: str) -> SubscriptionModel | None:
         """Get a subscription by ID."""
         with self._db_operation():
             query = Query()
-            result = self.subscriptions_table.search(query.id == str(subscription_id))
+            result = self.subscriptions_table.search(query.id == subscription_id)
             if result:
                 data = self._deserialize_from_db(result[0])
                 return SubscriptionModel(**data)
@@ -233,7 +292,7 @@ class DatabaseManager:
 
     def update_subscription(
         self,
-        subscription_id: UUID,
+        subscription_id: str,
         updates: dict[str, Any],
     ) -> SubscriptionModel | None:
         """Update a subscription."""
@@ -247,20 +306,24 @@ class DatabaseManager:
 
             self.subscriptions_table.update(
                 serialized_updates,
-                query.id == str(subscription_id),
+                query.id == subscription_id,
             )
-            return self.get_subscription(subscription_id)
+            subscription = self.get_subscription(subscription_id)
+            if subscription and "servers" in updates:
+                self._index_servers(subscription_id, subscription.servers)
+            return subscription
 
-    def delete_subscription(self, subscription_id: UUID) -> bool:
+    def delete_subscription(self, subscription_id: str) -> bool:
         """Delete a subscription."""
         with self._db_operation():
             query = Query()
-            result = self.subscriptions_table.remove(query.id == str(subscription_id))
+            result = self.subscriptions_table.remove(query.id == subscription_id)
+            self._index_servers(subscription_id, [])
             return len(result) > 0
 
     def update_subscription_servers(
         self,
-        subscription_id: UUID,
+        subscription_id: str,
         servers: list[ServerModel],
     ) -> SubscriptionModel | None:
         """Update servers for a subscription."""
@@ -273,11 +336,13 @@ class DatabaseManager:
 
     def update_subscription_with_user_info(
         self,
-        subscription_id: UUID,
+        subscription_id: str,
         servers: list[ServerModel],
         user_info,
+        etag: str | None = None,
+        last_modified: str | None = None,
     ) -> SubscriptionModel | None:
-        """Update servers and user info for a subscription."""
+        """Update servers, user info and HTTP cache validators for a subscription."""
         serialized_servers = [self._serialize_for_db(server.model_dump()) for server in servers]
         updates = {
             "servers": serialized_servers,
@@ -287,14 +352,18 @@ class DatabaseManager:
         # Add user_info if provided
         if user_info:
             updates["user_info"] = self._serialize_for_db(user_info.model_dump())
+        if etag:
+            updates["etag"] = etag
+        if last_modified:
+            updates["last_modified"] = last_modified
 
         return self.update_subscription(subscription_id, updates)
 
     # Server operations (within subscriptions)
     def get_server(
         self,
-        subscription_id: UUID,
-        server_id: UUID,
+        subscription_id: str,
+        server_id: str,
     ) -> ServerModel | None:
         """Get a server by ID within a subscription."""
         subscription = self.get_subscription(subscription_id)
@@ -306,8 +375,8 @@ class DatabaseManager:
 
     def update_server_status(
         self,
-        subscription_id: UUID,
-        server_id: UUID,
+        subscription_id: str,
+        server_id: str,
         status: str,
     ) -> ServerModel | None:
         """Update server status."""
@@ -324,6 +393,29 @@ class DatabaseManager:
                         return subscription.servers[i]
             return None
 
+    def mark_server_status(self, server_id: str, status: str) -> str | None:
+        """Set a server's status with a single write.
+
+        Returns:
+            The id of the subscription holding the server, or None if the server is unknown.
+
+        """
+        with self._db_operation():
+            entry = self._server_index.get(server_id)
+            if entry is None:
+                return None
+            subscription_id, remarks, _status = entry
+
+            def set_status(doc: dict[str, Any]) -> None:
+                for server in doc.get("servers") or []:
+                    if server.get("id") == server_id:
+                        server["status"] = status
+                doc["last_updated"] = datetime.now().isoformat()
+
+            self.subscriptions_table.update(set_status, Query().id == subscription_id)
+            self._server_index[server_id] = (subscription_id, remarks, status)
+            return subscription_id
+
     # Settings operations
     def get_settings(self) -> SettingsModel:
         """Get current settings."""
@@ -334,15 +426,16 @@ class DatabaseManager:
             if not settings.xray_binary:
                 is_available, xray_path = check_xray_command_available()
                 if is_available and xray_path:
-                    settings.xray_binary = xray_path
-                    settings.xray_assets_folder = settings.xray_assets_folder
+                    settings = settings.model_copy(update={"xray_binary": xray_path})
                 else:
                     xray_data_dir = get_xray_data_directory()
                     xray_data_dir.mkdir(parents=True, exist_ok=True)
-                    settings.xray_binary = str(
-                        xray_data_dir / get_default_xray_binary_filename(),
+                    settings = settings.model_copy(
+                        update={
+                            "xray_binary": str(xray_data_dir / get_default_xray_binary_filename()),
+                            "xray_assets_folder": str(xray_data_dir),
+                        },
                     )
-                    settings.xray_assets_folder = str(xray_data_dir)
 
                 self.update_settings(settings)
 
@@ -1,49 +1,94 @@
+import logging
 import os
 import platform
+import threading
 import tkinter as tk
-from typing import Any
-
-import pystray
-import webview
-from PIL import Image
-from pystray import MenuItem as Item
+from functools import lru_cache, partial
+from importlib import import_module
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any
 
+from app.gui.expose import exposed_methods
 from app.gui.ops_api import OperationsApi
 from app.gui.window_api import WindowApi
 from settings import APP_ROOT, DATA_DIR, DEBUG
 
+if TYPE_CHECKING:
+    import webview
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+SYSTEM = platform.system().lower()
+
+# Platform-specific icon file and pywebview backend, defaulting to Linux
+ICON_EXT = {"windows": "ico", "darwin": "icns"}.get(SYSTEM, "png")
+ICON_PATH = os.fspath(APP_ROOT / "assets" / f"icon.{ICON_EXT}")
+GUI_TYPE = {"windows": "edgechromium", "darwin": "cocoa"}.get(SYSTEM, "gtk")
+EASY_DRAG = SYSTEM not in ("windows", "darwin")
+
+@lru_cache(maxsize=1)
+def load_icon(path: str) -> "Image.Image":
+    """Open and fully decode the tray icon, once per process."""
+    from PIL import Image
+
+    icon = Image.open(path)
+    icon.load()
+    return icon
+
+
+def _tray_toggle(api: WindowApi, icon, item=None) -> None:
+    api.toggle()
+
+
+def _tray_quit(api: WindowApi, icon, item=None) -> None:
+    api.quit()
+    icon.stop()
+
 
 class GuiManager:
     """GUI manager for Nabzram application."""
 
+    # Main window options; sizes are in 96 DPI pixels and scaled in create_main_window
+    _WINDOW_DEFAULTS = MappingProxyType(
+        {
+            "width": 500,
+            "height": 900,
+            "min_size": (500, 900),
+            "resizable": True,
+            "frameless": True,
+            "background_color": "#020817",
+        },
+    )
+
     def __init__(self) -> None:
-        self.system = platform.system().lower()
+        self.system = SYSTEM
         self.storage_path = str(DATA_DIR / "storage")
-        self.icon_path = self._get_icon_path()
-        self.gui_type = self._get_gui_type()
-        self.easy_drag = self._get_easy_drag()
+        self.icon_path = ICON_PATH
+        self.gui_type = GUI_TYPE
+        self.easy_drag = EASY_DRAG
         self.dpi_scale = self._get_dpi_scale()
+        self._window_api: WindowApi | None = None
         self._setup_environment()
 
-    def _get_icon_path(self) -> str:
-        """Get the appropriate icon path for the current platform."""
-        if self.system == "windows":
-            return os.path.abspath(APP_ROOT / "assets" / "icon.ico")
-        if self.system == "darwin":
-            return os.path.abspath(APP_ROOT / "assets" / "icon.icns")
-        return os.path.abspath(APP_ROOT / "assets" / "icon.png")
-
-    def _get_gui_type(self) -> str:
-        """Get the appropriate GUI type for the current platform."""
-        if self.system == "windows":
-            return "edgechromium"
-        if self.system == "darwin":
-            return "cocoa"
-        return "gtk"
-
-    def _get_easy_drag(self) -> bool:
-        """Get the easy drag setting for the current platform."""
-        return self.system not in ("windows", "darwin")
+    def prewarm(self) -> None:
+        """Import webview and load the tray icon on a background thread."""
+        threading.Thread(target=self._touch_runtime, daemon=True).start()
+
+    def _touch_runtime(self) -> None:
+        """Decode the tray icon and import webview ahead of start_gui."""
+        try:
+            load_icon(self.icon_path)
+        except (ImportError, OSError) as e:
+            # _setup_tray loads the icon itself and reports the failure there
+            logger.debug("Failed to preload tray icon: %s", e)
+
+        # Only the pure-Python package: the native backends (clr/WinForms, WebKit, GTK) expect
+        # to be initialized by the main thread that runs webview.start()
+        try:
+            import_module("webview")
+        except ImportError as e:
+            logger.debug("Failed to preload webview: %s", e)
 
     def _setup_environment(self) -> None:
         """Setup environment variables for the current platform."""
@@ -62,58 +107,55 @@ class GuiManager:
 
     def _setup_tray(self, window, api: WindowApi):
         """Setup system tray with left click = toggle, right click = menu."""
-
-        def toggle(icon, item=None) -> None:
-            api.toggle()
-
-        def on_quit(icon, item) -> None:
-            api.quit()
-            icon.stop()
+        import pystray
+        from pystray import MenuItem as Item
 
         tray_icon = pystray.Icon(
             "Nabzram",
-            Image.open(self.icon_path),
+            load_icon(self.icon_path),
             menu=pystray.Menu(
-                Item("Show Window", toggle, default=True),  # 👈 default = left click
-                Item("Quit", on_quit),
+                Item("Show Window", partial(_tray_toggle, api), default=True),  # 👈 default = left click
+                Item("Quit", partial(_tray_quit, api)),
             ),
         )
 
         tray_icon.run_detached()
         return tray_icon
 
-    def create_main_window(self, url: str, **kwargs) -> webview.Window:
+    def create_main_window(self, url: str, **kwargs) -> "webview.Window":
         """Create the main application window."""
-        width = int(kwargs.pop("width", 500) * self.dpi_scale)
-        height = int(kwargs.pop("height", 900) * self.dpi_scale)
-        min_size = kwargs.pop("min_size", (500, 900))
-        min_size = (int(min_size[0] * self.dpi_scale), int(min_size[1] * self.dpi_scale))
+        import webview
+
+        options = {**self._WINDOW_DEFAULTS, "easy_drag": self.easy_drag, **kwargs}
+        min_width, min_height = options.pop("min_size")
         return webview.create_window(
             "Nabzram",
             url,
-            width=width,
-            height=height,
-            min_size=min_size,
-            resizable=kwargs.pop("resizable", True),
-            frameless=kwargs.pop("frameless", True),
-            easy_drag=kwargs.pop("easy_drag", self.easy_drag),
-            background_color=kwargs.pop("background_color", "#020817"),
-            **kwargs,
+            width=int(options.pop("width") * self.dpi_scale),
+            height=int(options.pop("height") * self.dpi_scale),
+            min_size=(int(min_width * self.dpi_scale), int(min_height * self.dpi_scale)),
+            **options,
         )
 
-    def _register_api(self, window: webview.Window, api: Any) -> None:
-        """Register API methods with the webview window."""
-        methods = [getattr(api, name) for name in dir(api) if not name.startswith("_") and callable(getattr(api, name))]
-        window.expose(*methods)
+    def _get_window_api(self, window: "webview.Window") -> WindowApi:
+        """Get the WindowApi shared by the tray and the JS bridge for this window."""
+        if self._window_api is None or self._window_api.window is not window:
+            self._window_api = WindowApi(window)
+        return self._window_api
 
-    def start_tray(self, window: webview.Window):
+    def _register_api(self, window: "webview.Window", *apis: Any) -> None:
+        """Register the API methods of all given objects with a single expose call."""
+        window.expose(*(method for api in apis for method in exposed_methods(api)))
+
+    def start_tray(self, window: "webview.Window"):
         """Start the tray application."""
-        self._setup_tray(window, WindowApi(window))
+        self._setup_tray(window, self._get_window_api(window))
 
-    def start_gui(self, window: webview.Window, **kwargs):
+    def start_gui(self, window: "webview.Window", **kwargs):
         """Start the GUI application."""
-        self._register_api(window, WindowApi(window))
-        self._register_api(window, OperationsApi(window))
+        import webview
+
+        self._register_api(window, self._get_window_api(window), OperationsApi(window))
 
         zoom_level = 1.0 / self.dpi_scale
         webview.start(
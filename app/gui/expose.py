@@ -0,0 +1,20 @@
+"""Registry of API methods exposed to JavaScript through pywebview."""
+
+from collections.abc import Callable
+from typing import Any
+
+
+def expose[F: Callable[..., Any]](func: F) -> F:
+    """Mark a method to be exposed on window.pywebview.api."""
+    func.__exposed__ = True
+    return func
+
+
+def exposed_methods(api: Any) -> list[Callable[..., Any]]:
+    """Get the bound methods of an API object that are marked with @expose."""
+    cls = type(api)
+    names = cls.__dict__.get("_exposed_names")
+    if names is None:
+        names = tuple(name for name, value in vars(cls).items() if getattr(value, "__exposed__", False))
+        cls._exposed_names = names
+    return [getattr(api, name) for name in names]
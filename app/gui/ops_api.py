@@ -3,12 +3,15 @@
 import logging
 from typing import Any
 
-from app.ops import appearance, logs, servers, settings, subscriptions, system, updates
+from app import ops
+from app.gui.expose import expose
 
 
 class OperationsApi:
     """Full in-process Operations API."""
 
+    __slots__ = ("logger", "window")
+
     def __init__(self, window) -> None:
         self.window = window
         self.logger = logging.getLogger(__name__)
@@ -16,88 +19,116 @@ class OperationsApi:
     # ──────────────────────────────
     # Settings
     # ──────────────────────────────
+    @expose
     def get_settings(self) -> dict[str, Any]:
-        return settings.get_settings()
+        return ops.settings.get_settings()
 
-    def update_settings(self, payload: dict[str, Any]) -> dict[str, Any]:
-        return settings.update_settings(payload)
+    @expose
+    def update_settings(self, payload: str | dict[str, Any]) -> dict[str, Any]:
+        return ops.settings.update_settings(payload)
 
     # ──────────────────────────────
     # Appearance
     # ──────────────────────────────
+    @expose
     def get_appearance(self) -> dict[str, Any]:
-        return appearance.get_appearance()
+        return ops.appearance.get_appearance()
 
-    def update_appearance(self, payload: dict[str, Any]) -> dict[str, Any]:
-        return appearance.update_appearance(payload)
+    @expose
+    def update_appearance(self, payload: str | dict[str, Any]) -> dict[str, Any]:
+        return ops.appearance.update_appearance(payload)
 
     # ──────────────────────────────
     # Subscriptions
     # ──────────────────────────────
+    @expose
     def list_subscriptions(self) -> list[dict[str, Any]]:
-        return subscriptions.list_subscriptions()
+        return ops.subscriptions.list_subscriptions()
+
+    @expose
+    def list_subscriptions_page(self, limit: int = 50, cursor: str | None = None) -> dict[str, Any]:
+        return ops.subscriptions.list_subscriptions_page(limit, cursor)
 
+    @expose
     def get_subscription(self, subscription_id: str) -> dict[str, Any]:
-        return subscriptions.get_subscription(subscription_id)
+        return ops.subscriptions.get_subscription(subscription_id)
 
-    def create_subscription(self, payload: dict[str, Any]) -> dict[str, Any]:
-        return subscriptions.create_subscription(payload)
+    @expose
+    def create_subscription(self, payload: str | dict[str, Any]) -> dict[str, Any]:
+        return ops.subscriptions.create_subscription(payload)
 
+    @expose
     def update_subscription(
         self,
         subscription_id: str,
-        payload: dict[str, Any],
+        payload: str | dict[str, Any],
     ) -> dict[str, Any]:
-        return subscriptions.update_subscription(subscription_id, payload)
+        return ops.subscriptions.update_subscription(subscription_id, payload)
 
+    @expose
     def delete_subscription(self, subscription_id: str) -> dict[str, Any]:
-        return subscriptions.delete_subscription(subscription_id)
+        return ops.subscriptions.delete_subscription(subscription_id)
 
+    @expose
     def refresh_subscription_servers(self, subscription_id: str) -> dict[str, Any]:
-        return subscriptions.refresh_subscription_servers(subscription_id)
+        return ops.subscriptions.refresh_subscription_servers(subscription_id)
 
     # ──────────────────────────────
     # Server management
     # ──────────────────────────────
+    @expose
     def start_server(self, subscription_id: str, server_id: str) -> dict[str, Any]:
-        return servers.start_server(subscription_id, server_id)
+        return ops.servers.start_server(subscription_id, server_id)
 
+    @expose
     def stop_server(self) -> dict[str, Any]:
-        return servers.stop_server()
+        return ops.servers.stop_server()
 
+    @expose
     def get_server_status(self) -> dict[str, Any]:
-        return servers.get_server_status()
+        return ops.servers.get_server_status()
 
+    @expose
     def test_subscription_servers(self, subscription_id: str) -> dict[str, Any]:
-        return servers.test_subscription_servers(subscription_id)
+        return ops.servers.test_subscription_servers(subscription_id)
 
     # ──────────────────────────────
     # System
     # ──────────────────────────────
+    @expose
     def get_xray_status(self) -> dict[str, Any]:
-        return system.get_xray_status()
+        return ops.system.get_xray_status()
 
     # ──────────────────────────────
     # Updates
     # ──────────────────────────────
+    @expose
     def get_xray_version_info(self) -> dict[str, Any]:
-        return updates.get_xray_version_info()
+        return ops.updates.get_xray_version_info()
 
+    @expose
     def update_xray(self, payload: dict[str, Any]) -> dict[str, Any]:
-        return updates.update_xray(payload)
+        return ops.updates.update_xray(payload)
 
+    @expose
     def update_geodata(self) -> dict[str, Any]:
-        return updates.update_geodata()
+        return ops.updates.update_geodata()
+
+    @expose
+    def get_update_status(self, task_id: str) -> dict[str, Any]:
+        return ops.updates.get_update_status(task_id)
 
     # ──────────────────────────────
     # Logs
     # ──────────────────────────────
+    @expose
     def get_log_snapshot(self, limit: int = 200) -> dict[str, Any]:
-        return logs.get_log_snapshot(limit)
+        return ops.logs.get_log_snapshot(limit)
 
+    @expose
     def get_log_stream_batch(
         self,
         since_ms: int | None = None,
         limit: int = 200,
     ) -> dict[str, Any]:
-        return logs.get_log_stream_batch(since_ms, limit)
+        return ops.logs.get_log_stream_batch(since_ms, limit)
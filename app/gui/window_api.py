@@ -1,55 +1,83 @@
 """Window API - pywebview window control functions."""
 
+from app.gui.expose import expose
+
 
 class WindowApi:
     """API exposed to JavaScript for controlling the pywebview window."""
 
+    __slots__ = ("_is_hidden", "_is_minimized", "window")
+
     def __init__(self, window) -> None:
         self.window = window
         self._is_hidden = False
+        self._is_minimized = False
+
+        # pywebview doesn't track window state, so follow the native events as well.
+        # This catches minimize/restore done through the taskbar, dock or window manager.
+        window.events.minimized += self._on_minimized
+        window.events.restored += self._on_restored
+        window.events.maximized += self._on_restored
+
+    def _on_minimized(self) -> None:
+        self._is_minimized = True
+
+    def _on_restored(self) -> None:
+        self._is_minimized = False
 
     # ──────────────────────────────
     # Basic controls
     # ──────────────────────────────
+    @expose
     def show(self) -> None:
         """Show the window."""
         self.window.show()
-        self.window.restore()
+        # window.minimized is only the creation flag in pywebview, so use our tracked state
+        if self._is_minimized:
+            self.window.restore()
         self._is_hidden = False
+        self._is_minimized = False
 
+    @expose
     def hide(self) -> None:
         """Hide window (close-to-tray behavior)."""
         self.window.hide()
         self._is_hidden = True
 
+    @expose
     def minimize(self) -> None:
         """Minimize to taskbar/dock."""
         self.window.minimize()
-        self._is_hidden = True
+        self._is_minimized = True
 
+    @expose
     def maximize(self) -> None:
         """Maximize the window."""
         self.window.maximize()
         self._is_hidden = False
+        self._is_minimized = False
 
+    @expose
     def restore(self) -> None:
         """Restore from minimized/maximized."""
         self.window.restore()
         self._is_hidden = False
+        self._is_minimized = False
 
+    @expose
     def close(self) -> None:
         """Alias for hide() to support close-to-tray."""
         self.hide()
-        self._is_hidden = True
 
+    @expose
     def toggle(self) -> None:
         """Toggle the window."""
-        if self._is_hidden:
+        if self._is_hidden or self._is_minimized:
             self.show()
-            self.restore()
         else:
             self.hide()
 
+    @expose
     def quit(self) -> None:
         """Destroy the window."""
         self.window.destroy()
@@ -57,10 +85,12 @@ class WindowApi:
     # ──────────────────────────────
     # Window states
     # ──────────────────────────────
+    @expose
     def is_visible(self) -> bool:
         """Return True if window is visible."""
-        return not self._is_hidden
+        return not (self._is_hidden or self._is_minimized)
 
+    @expose
     def is_focused(self) -> bool:
         """Return True if window is focused."""
         return self.window.focus
@@ -68,26 +98,32 @@ class WindowApi:
     # ──────────────────────────────
     # Advanced controls
     # ──────────────────────────────
+    @expose
     def toggle_fullscreen(self) -> None:
         """Toggle fullscreen mode."""
         self.window.toggle_fullscreen()
 
+    @expose
     def set_on_top(self, value: bool) -> None:
         """Keep window always on top."""
         self.window.on_top = bool(value)
 
+    @expose
     def resize(self, width: int, height: int) -> None:
         """Resize window to given dimensions."""
         self.window.resize(width, height)
 
+    @expose
     def move(self, x: int, y: int) -> None:
         """Move window to (x, y) on screen."""
         self.window.move(x, y)
 
+    @expose
     def get_size(self) -> tuple[int, int]:
         """Get current window size (width, height)."""
         return self.window.width, self.window.height
 
+    @expose
     def get_position(self) -> tuple[int, int]:
         """Get current window position (x, y)."""
         return self.window.x, self.window.y
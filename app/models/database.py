@@ -1,11 +1,41 @@
 """Database models for TinyDB storage."""
 
+from collections.abc import Mapping
 from datetime import datetime
 from enum import Enum
-from typing import Any, Optional
+from types import MappingProxyType
+from typing import Annotated, Any, Optional
 from uuid import UUID, uuid4
 
-from pydantic import BaseModel, Field, field_serializer
+from pydantic import AfterValidator, BaseModel, BeforeValidator, ConfigDict, Field, PlainSerializer
+
+
+def normalize_id(value: Any) -> Any:
+    """Convert UUID objects and dashed UUID strings to the 32-char hex id format."""
+    if isinstance(value, UUID):
+        return value.hex
+    if isinstance(value, str) and len(value) == 36:
+        try:
+            return UUID(value).hex
+        except ValueError:
+            return value  # Not a UUID; left as is so it matches no id
+    return value
+
+
+Id = Annotated[str, BeforeValidator(normalize_id)]
+
+# Server configs share their nested parts with the database's document cache, so they are
+# handed out read-only; code that needs a changed config copies what it changes on write
+RawConfig = Annotated[
+    Mapping[str, Any],
+    AfterValidator(MappingProxyType),
+    PlainSerializer(dict, return_type=dict[str, Any]),
+]
+
+
+def new_id() -> str:
+    """Generate a new random id."""
+    return uuid4().hex
 
 
 class XrayLogLevel(str, Enum):
@@ -19,20 +49,20 @@ class XrayLogLevel(str, Enum):
 class ServerModel(BaseModel):
     """Server model for database storage."""
 
-    id: UUID = Field(default_factory=uuid4)
+    model_config = ConfigDict(extra="ignore")
+
+    id: Id = Field(default_factory=new_id)
     remarks: str = Field(..., description="Server remarks from subscription")
-    raw: dict[str, Any] = Field(..., description="Full JSON config")
+    raw: RawConfig = Field(..., description="Full JSON config")
     status: str = Field(default="stopped", description="Server status")
 
-    @field_serializer("id")
-    def serialize_id(self, value: UUID) -> str:
-        return str(value)
-
 
 class SubscriptionModel(BaseModel):
     """Subscription model for database storage."""
 
-    id: UUID = Field(default_factory=uuid4)
+    model_config = ConfigDict(extra="ignore")
+
+    id: Id = Field(default_factory=new_id)
     name: str = Field(..., description="Subscription name")
     url: str = Field(..., description="Subscription URL (normalized)")
     servers: list[ServerModel] = Field(
@@ -44,14 +74,11 @@ class SubscriptionModel(BaseModel):
         None,
         description="User traffic and expiry info",
     )
-
-    @field_serializer("id")
-    def serialize_id(self, value: UUID) -> str:
-        return str(value)
-
-    @field_serializer("last_updated")
-    def serialize_last_updated(self, value: datetime | None) -> str | None:
-        return value.isoformat() if value else None
+    etag: str | None = Field(None, description="ETag of the last fetched subscription response")
+    last_modified: str | None = Field(
+        None,
+        description="Last-Modified of the last fetched subscription response",
+    )
 
 
 class SubscriptionUserInfo(BaseModel):
@@ -67,14 +94,12 @@ class SubscriptionUserInfo(BaseModel):
         description="Expiry date (None if no expiry)",
     )
 
-    @field_serializer("expire")
-    def serialize_expire(self, value: datetime | None) -> str | None:
-        return value.isoformat() if value else None
-
 
 class SettingsModel(BaseModel):
     """Settings model for database storage."""
 
+    model_config = ConfigDict(frozen=True)
+
     socks_port: int | None = Field(None, description="Global SOCKS port override")
     http_port: int | None = Field(None, description="Global HTTP port override")
     xray_binary: str | None = Field(None, description="Path to xray binary")
@@ -94,23 +119,19 @@ class SettingsModel(BaseModel):
 class ProcessInfo(BaseModel):
     """Process information for running servers (not stored in database)."""
 
-    server_id: UUID
-    subscription_id: UUID
+    model_config = ConfigDict(extra="ignore")
+
+    server_id: Id
+    subscription_id: Id
     process_id: int
     start_time: datetime
     config: dict[str, Any]
 
-    @field_serializer("server_id", "subscription_id")
-    def serialize_uuids(self, value: UUID) -> str:
-        return str(value)
-
-    @field_serializer("start_time")
-    def serialize_start_time(self, value: datetime) -> str:
-        return value.isoformat()
-
 
 class AppearanceModel(BaseModel):
     """Settings model for database storage."""
 
+    model_config = ConfigDict(frozen=True)
+
     theme: str | None = Field(None, description="Theme")
     font: str | None = Field(None, description="Font")
@@ -1,8 +1,9 @@
 """App operations module."""
 
-from . import logs, servers, settings, subscriptions, system, updates, utils
+from importlib import import_module
 
 __all__ = [
+    "appearance",
     "logs",
     "servers",
     "settings",
@@ -11,3 +12,11 @@ __all__ = [
     "updates",
     "utils",
 ]
+
+
+def __getattr__(name: str):
+    # Submodules are imported on first access so the GUI only pays for the ops it uses
+    if name in __all__:
+        return import_module(f"{__name__}.{name}")
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
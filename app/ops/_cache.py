@@ -0,0 +1,61 @@
+"""Short-lived cache for replies built by ops modules."""
+
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe cache whose entries expire after ``ttl`` seconds or on invalidation."""
+
+    def __init__(self, ttl: float = 1.0) -> None:
+        self.ttl = ttl
+        self._entries: dict[str, tuple[float, Any]] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached value for key, or default if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return default
+        return entry[1]
+
+    def get_or_build[T](self, key: str, build: Callable[[], T]) -> T:
+        """Return the cached value for key, building and storing it on a miss."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        generation = self._generation
+        value = build()
+        with self._lock:
+            # Don't store a value that was built from data invalidated in the meantime
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def invalidate(self, key: str) -> None:
+        """Drop a single entry."""
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        """Drop every entry whose key starts with prefix."""
+        with self._lock:
+            self._generation += 1
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+cache = TTLCache(ttl=1.0)
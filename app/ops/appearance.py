@@ -4,12 +4,16 @@ from pydantic import ValidationError
 
 from app.database import db
 from app.models.database import AppearanceModel
-from app.models.schemas import AppearanceUpdate
-from app.ops.utils import error_reply, validation_error_reply
+from app.ops._cache import cache
+from app.ops.utils import error_reply, validate_payload, validation_error_reply
 
 
 def get_appearance() -> dict[str, Any]:
     """Get current appearance."""
+    return dict(cache.get_or_build("appearance", _build_appearance))
+
+
+def _build_appearance() -> dict[str, Any]:
     a = db.get_appearance()
     return {
         "theme": a.theme,
@@ -17,10 +21,10 @@ def get_appearance() -> dict[str, Any]:
     }
 
 
-def update_appearance(payload: AppearanceUpdate) -> dict[str, Any]:
+def update_appearance(payload: str | dict[str, Any]) -> dict[str, Any]:
     """Update appearance."""
     try:
-        update = db.update_appearance(AppearanceModel.model_validate(payload))
+        update = db.update_appearance(validate_payload(AppearanceModel, payload))
     except ValidationError as e:
         return validation_error_reply(e)
     except Exception as e:
@@ -32,6 +36,7 @@ def update_appearance(payload: AppearanceUpdate) -> dict[str, Any]:
     a = a.model_copy(update=update_data)
 
     db.update_appearance(a)
+    cache.invalidate("appearance")
 
     return {
         "success": True,
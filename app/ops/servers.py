@@ -1,8 +1,11 @@
 """Server operations."""
 
+from operator import itemgetter
+from types import MappingProxyType
 from typing import Any
 
 from app.database import db
+from app.ops.subscriptions import refresh_cached
 from app.ops.utils import (
     clear_socks_system_proxy,
     error_reply,
@@ -11,6 +14,28 @@ from app.ops.utils import (
 )
 from app.services.process_service import process_manager
 
+# Required fields of a process_manager test result, in reply order
+_test_result_fields = itemgetter("server_id", "remarks", "success", "socks_port", "http_port")
+
+# Static replies for when nothing is running; callers get a copy
+_NO_SERVER_RUNNING = MappingProxyType(
+    {
+        "success": True,
+        "message": "No server is currently running",
+        "server_id": None,
+        "status": "stopped",
+    },
+)
+_NO_SERVER_STATUS = MappingProxyType(
+    {
+        **_NO_SERVER_RUNNING,
+        "remarks": None,
+        "process_id": None,
+        "start_time": None,
+        "allocated_ports": None,
+    },
+)
+
 
 def start_server(subscription_id: str, server_id: str) -> dict[str, Any]:
     """Start a server."""
@@ -23,7 +48,7 @@ def start_server(subscription_id: str, server_id: str) -> dict[str, Any]:
         return {
             "success": True,
             "message": f"Server '{server.remarks}' is already running",
-            "server_id": str(srv_id),
+            "server_id": srv_id,
             "status": "running",
             "remarks": server.remarks,
         }
@@ -37,7 +62,8 @@ def start_server(subscription_id: str, server_id: str) -> dict[str, Any]:
     )
 
     if ok:
-        db.update_server_status(sid, srv_id, "running")
+        db.mark_server_status(srv_id, "running")
+        refresh_cached(sid)
 
         if settings.system_proxy:
             ports = process_manager.get_current_server_port_info()
@@ -49,77 +75,59 @@ def start_server(subscription_id: str, server_id: str) -> dict[str, Any]:
         return {
             "success": True,
             "message": f"Server '{server.remarks}' started successfully",
-            "server_id": str(srv_id),
+            "server_id": srv_id,
             "status": "running",
             "remarks": server.remarks,
         }
-    db.update_server_status(sid, srv_id, "error")
+    db.mark_server_status(srv_id, "error")
+    refresh_cached(sid)
     return error_reply(err or f"Failed to start server '{server.remarks}'")
 
 
 def stop_server() -> dict[str, Any]:
     """Stop the currently running server."""
     if not process_manager.is_any_server_running():
-        return {
-            "success": True,
-            "message": "No server is currently running",
-            "server_id": None,
-            "status": "stopped",
-        }
+        return dict(_NO_SERVER_RUNNING)
     current_id = process_manager.get_current_server_id()
-    ok = process_manager.stop_current_server()
-    if ok and current_id:
-        subs = db.get_all_subscriptions()
-        for sub in subs:
-            for srv in sub.servers:
-                if srv.id == current_id:
-                    db.update_server_status(sub.id, srv.id, "stopped")
-                    break
+    if not process_manager.stop_current_server():
+        return error_reply("Failed to stop server")
 
-        settings = db.get_settings()
-        if settings.system_proxy:
-            clear_socks_system_proxy()
+    if current_id:
+        sub_id = db.mark_server_status(current_id, "stopped")
+        if sub_id:
+            refresh_cached(sub_id)
 
-        return {
-            "success": True,
-            "message": "Server stopped successfully",
-            "server_id": str(current_id),
-            "status": "stopped",
-        }
+    settings = db.get_settings()
+    if settings.system_proxy:
+        clear_socks_system_proxy()
 
-    return error_reply("Failed to stop server")
+    return {
+        "success": True,
+        "message": "Server stopped successfully",
+        "server_id": current_id,
+        "status": "stopped",
+    }
 
 
 def get_server_status() -> dict[str, Any]:
     """Get current server status."""
     if not process_manager.is_any_server_running():
-        return {
-            "success": True,
-            "message": "No server is currently running",
-            "server_id": None,
-            "status": "stopped",
-            "remarks": None,
-            "process_id": None,
-            "start_time": None,
-            "allocated_ports": None,
-        }
+        return dict(_NO_SERVER_STATUS)
     current_id = process_manager.get_current_server_id()
     info = process_manager.get_current_server_info()
     ports = process_manager.get_current_server_port_info()
     allocated_ports = [{"port": p["port"], "protocol": p["protocol"], "tag": p["tag"]} for p in ports]
     server_remarks = "Unknown"
-    subs = db.get_all_subscriptions()
-    for sub in subs:
-        for srv in sub.servers:
-            if srv.id == current_id:
-                server_remarks = srv.remarks
-                if srv.status != "running":
-                    db.update_server_status(sub.id, srv.id, "running")
-                break
+    found = db.find_server(current_id) if current_id else None
+    if found:
+        sub_id, server_remarks, status = found
+        if status != "running":
+            db.mark_server_status(current_id, "running")
+            refresh_cached(sub_id)
     return {
         "success": True,
         "message": "Server is running",
-        "server_id": str(current_id) if current_id else None,
+        "server_id": current_id,
         "status": "running",
         "remarks": server_remarks,
         "process_id": getattr(info, "process_id", None) if info else None,
@@ -140,7 +148,7 @@ def test_subscription_servers(subscription_id: str) -> dict[str, Any]:
         return {
             "success": True,
             "message": "No servers to test",
-            "subscription_id": str(sid),
+            "subscription_id": sid,
             "subscription_name": sub.name,
             "total_servers": 0,
             "successful_tests": 0,
@@ -154,26 +162,31 @@ def test_subscription_servers(subscription_id: str) -> dict[str, Any]:
         test_timeout=3,
     )
 
-    success_cnt = sum(1 for r in results if r.get("success"))
+    success_cnt = 0
+    reply_results = []
+    for r in results:
+        server_id, remarks, success, socks_port, http_port = _test_result_fields(r)
+        if success:
+            success_cnt += 1
+        reply_results.append(
+            {
+                "server_id": server_id,
+                "remarks": remarks,
+                "success": success,
+                "ping_ms": r.get("ping_ms"),
+                "error": r.get("error"),
+                "socks_port": socks_port,
+                "http_port": http_port,
+            },
+        )
     fail_cnt = len(results) - success_cnt
     return {
         "success": True,
         "message": f"Tested {len(sub.servers)} servers: {success_cnt} successful, {fail_cnt} failed",
-        "subscription_id": str(sid),
+        "subscription_id": sid,
         "subscription_name": sub.name,
         "total_servers": len(sub.servers),
         "successful_tests": success_cnt,
         "failed_tests": fail_cnt,
-        "results": [
-            {
-                "server_id": str(r["server_id"]),
-                "remarks": r["remarks"],
-                "success": r["success"],
-                "ping_ms": r.get("ping_ms"),
-                "error": r.get("error"),
-                "socks_port": r["socks_port"],
-                "http_port": r["http_port"],
-            }
-            for r in results
-        ],
+        "results": reply_results,
     }
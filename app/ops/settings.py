@@ -6,8 +6,10 @@ from typing import Any
 from pydantic import ValidationError
 
 from app.database import db
+from app.models.database import SettingsModel
 from app.models.schemas import SettingsUpdate
-from app.ops.utils import error_reply, validation_error_reply
+from app.ops._cache import cache
+from app.ops.utils import error_reply, validate_payload, validation_error_reply
 from app.services.process_service import process_manager
 
 logger = logging.getLogger(__name__)
@@ -15,63 +17,45 @@ logger = logging.getLogger(__name__)
 
 def get_settings() -> dict[str, Any]:
     """Get current settings."""
-    s = db.get_settings()
+    return dict(cache.get_or_build("settings", lambda: _settings_reply(db.get_settings())))
+
+
+def _settings_reply(s: SettingsModel) -> dict[str, Any]:
     return {
         "socks_port": s.socks_port,
         "http_port": s.http_port,
         "xray_binary": s.xray_binary,
         "xray_assets_folder": s.xray_assets_folder,
-        "xray_log_level": getattr(s, "xray_log_level", None),
-        "system_proxy": getattr(s, "system_proxy", True),
+        "xray_log_level": s.xray_log_level,
+        "system_proxy": s.system_proxy,
     }
 
 
-def update_settings(payload: dict[str, Any]) -> dict[str, Any]:
+def update_settings(payload: str | dict[str, Any]) -> dict[str, Any]:
     """Update settings and optionally restart current server."""
     try:
-        update = SettingsUpdate.model_validate(payload)
+        update = validate_payload(SettingsUpdate, payload)
     except ValidationError as e:
         return validation_error_reply(e)
     except Exception as e:
         return error_reply(f"Invalid settings: {e!s}")
 
-    update_data = update.model_dump(exclude_unset=True)
-
-    s = db.get_settings()
-    s = s.model_copy(update=update_data)
-
+    s = SettingsModel.model_validate(
+        {**db.get_settings().model_dump(), **update.model_dump(exclude_unset=True)},
+    )
     db.update_settings(s)
+    cache.invalidate("settings")
+    process_manager.invalidate_settings_cache()
 
     # Optionally restart current server if running with new ports
     try:
-        if process_manager.current_server_id and process_manager.is_server_running(
-            process_manager.current_server_id,
-        ):
-            server_info = process_manager.running_processes.get(
-                process_manager.current_server_id,
-            )
-            if server_info:
-                process_manager.stop_server(process_manager.current_server_id)
-                ok, _err = process_manager.start_single_server(
-                    server_info.server_id,
-                    server_info.subscription_id,
-                    server_info.config,
-                    s.socks_port,
-                    s.http_port,
-                )
-
-                if ok:
-                    logger.info("Server restarted after settings update")
+        if process_manager.restart_current(s.socks_port, s.http_port):
+            logger.info("Server restarted after settings update")
     except Exception as e:
-        logger.exception(f"Failed to restart server after settings update: {e}")
+        logger.exception("Failed to restart server after settings update: %s", e)
 
     return {
         "success": True,
         "message": "Settings updated successfully",
-        "socks_port": s.socks_port,
-        "http_port": s.http_port,
-        "xray_binary": s.xray_binary,
-        "xray_assets_folder": s.xray_assets_folder,
-        "xray_log_level": getattr(s, "xray_log_level", None),
-        "system_proxy": getattr(s, "system_proxy", True),
+        **_settings_reply(s),
     }
@@ -1,49 +1,50 @@
 """Subscription operations."""
 
+import atexit
+import threading
+from bisect import bisect_left, bisect_right
+from itertools import count
+from operator import itemgetter
 from typing import Any
 
 from pydantic import ValidationError
 
 from app.database import db
+from app.models.database import SubscriptionModel
 from app.models.schemas import SubscriptionCreate, SubscriptionUpdate
-from app.ops.utils import error_reply, to_uuid, validation_error_reply
+from app.ops._cache import cache
+from app.ops.utils import error_reply, to_uuid, validate_payload, validation_error_reply
 from app.services.subscription_service import SubscriptionService
 
-
-def list_subscriptions() -> list[dict[str, Any]]:
-    """List all subscriptions."""
-    subs = db.get_all_subscriptions()
-    result = []
-    for sub in subs:
-        result.append(
-            {
-                "id": str(sub.id),
-                "name": sub.name,
-                "url": sub.url,
-                "last_updated": sub.last_updated.isoformat() if sub.last_updated else None,
-                "server_count": len(sub.servers),
-                "user_info": (
-                    {
-                        "used_traffic": sub.user_info.used_traffic,
-                        "total": sub.user_info.total,
-                        "expire": sub.user_info.expire.isoformat() if sub.user_info and sub.user_info.expire else None,
-                    }
-                    if sub.user_info
-                    else None
-                ),
-            },
-        )
-    return result
-
-
-def get_subscription(subscription_id: str) -> dict[str, Any]:
-    """Get subscription details."""
-    sid = to_uuid(subscription_id)
-    sub = db.get_subscription(sid)
-    if not sub:
-        return error_reply("Subscription not found")
+# One service, and so one pooled HTTP session, shared by every subscription op
+_service: SubscriptionService | None = None
+_service_lock = threading.Lock()
+
+# Materialized list_subscriptions rows keyed by id, in storage order.
+# Loaded on first read and kept current by refresh_cached() on every write.
+_summaries: dict[str, dict[str, Any]] | None = None
+# (seq, id) of every row above, in the same order. Seqs only grow, so a page cursor holding
+# the last seq it returned still finds its place after that row is deleted.
+_positions: list[tuple[int, str]] = []
+_seq_by_id: dict[str, int] = {}
+_next_seq = count()
+_summaries_lock = threading.Lock()
+
+
+def _get_service() -> SubscriptionService:
+    """Get the shared subscription service, creating it on first use."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = SubscriptionService()
+                atexit.register(_service.close)
+    return _service
+
+
+def _summary(sub: SubscriptionModel) -> dict[str, Any]:
     return {
-        "id": str(sub.id),
+        "id": sub.id,
         "name": sub.name,
         "url": sub.url,
         "last_updated": sub.last_updated.isoformat() if sub.last_updated else None,
@@ -57,27 +58,112 @@ def get_subscription(subscription_id: str) -> dict[str, Any]:
             if sub.user_info
             else None
         ),
-        "servers": [{"id": str(s.id), "remarks": s.remarks, "status": s.status} for s in sub.servers],
     }
 
 
-def create_subscription(payload: dict[str, Any]) -> dict[str, Any]:
+def refresh_cached(subscription_id: str, sub: SubscriptionModel | None = None) -> None:
+    """Bring the cached replies for a subscription up to date after it was written."""
+    cache.invalidate(f"subs:{subscription_id}")
+    if sub is None:
+        sub = db.get_subscription(subscription_id)
+    with _summaries_lock:
+        if _summaries is None:
+            return
+        if sub:
+            _put_summary(_summary(sub))
+        else:
+            _drop_summary(subscription_id)
+
+
+def _load_summaries() -> dict[str, dict[str, Any]]:
+    """Get the materialized rows, loading them on first use; _summaries_lock must be held."""
+    global _summaries
+    if _summaries is None:
+        _summaries = {}
+        for sub in db.get_all_subscriptions():
+            _put_summary(_summary(sub))
+    return _summaries
+
+
+def _put_summary(row: dict[str, Any]) -> None:
+    """Add or replace a row; a new subscription goes last. _summaries_lock must be held."""
+    if row["id"] not in _summaries:
+        seq = next(_next_seq)
+        _positions.append((seq, row["id"]))
+        _seq_by_id[row["id"]] = seq
+    _summaries[row["id"]] = row
+
+
+def _drop_summary(subscription_id: str) -> None:
+    """Remove a row, if it is there; _summaries_lock must be held."""
+    if _summaries.pop(subscription_id, None) is not None:
+        seq = _seq_by_id.pop(subscription_id)
+        del _positions[bisect_left(_positions, (seq,))]
+
+
+def list_subscriptions() -> list[dict[str, Any]]:
+    """List all subscriptions."""
+    with _summaries_lock:
+        return list(_load_summaries().values())
+
+
+def list_subscriptions_page(limit: int = 50, cursor: str | None = None) -> dict[str, Any]:
+    """List subscriptions one page at a time, in the same order as list_subscriptions."""
+    with _summaries_lock:
+        summaries = _load_summaries()
+        start = 0
+        if cursor:
+            try:
+                after = int(cursor)
+            except ValueError:
+                return error_reply("Invalid cursor")
+            # Continue after the cursor's row, or where it was if it has been deleted since
+            start = bisect_right(_positions, after, key=itemgetter(0))
+        page = _positions[start : start + max(limit, 1)]
+        items = [summaries[subscription_id] for _, subscription_id in page]
+        has_more = start + len(page) < len(_positions)
+    return {
+        "items": items,
+        "next_cursor": str(page[-1][0]) if page and has_more else None,
+    }
+
+
+def get_subscription(subscription_id: str) -> dict[str, Any]:
+    """Get subscription details."""
+    sid = to_uuid(subscription_id)
+    reply = cache.get_or_build(f"subs:{sid}", lambda: _build_subscription(sid))
+    if reply is None:
+        return error_reply("Subscription not found")
+    return dict(reply)
+
+
+def _build_subscription(sid: str) -> dict[str, Any] | None:
+    sub = db.get_subscription(sid)
+    if not sub:
+        return None
+    return {
+        **_summary(sub),
+        "servers": [{"id": s.id, "remarks": s.remarks, "status": s.status} for s in sub.servers],
+    }
+
+
+def create_subscription(payload: str | dict[str, Any]) -> dict[str, Any]:
     """Create a new subscription."""
-    service = SubscriptionService()
     try:
-        data = SubscriptionCreate.model_validate(payload)
+        data = validate_payload(SubscriptionCreate, payload)
         settings = db.get_settings()
-        subscription = service.create_subscription(
+        subscription = _get_service().create_subscription(
             data,
             settings.socks_port,
             settings.http_port,
         )
 
         db.create_subscription(subscription)
+        refresh_cached(subscription.id, subscription)
         return {
             "success": True,
             "message": f"Subscription '{subscription.name}' created successfully",
-            "id": str(subscription.id),
+            "id": subscription.id,
             "name": subscription.name,
             "server_count": len(subscription.servers),
         }
@@ -85,37 +171,32 @@ def create_subscription(payload: dict[str, Any]) -> dict[str, Any]:
         return validation_error_reply(e)
     except Exception as e:
         return error_reply(f"Invalid subscription: {str(e)}")
-    finally:
-        service.close()
 
 
 def update_subscription(
     subscription_id: str,
-    payload: dict[str, Any],
+    payload: str | dict[str, Any],
 ) -> dict[str, Any]:
     """Update an existing subscription."""
     sid = to_uuid(subscription_id)
-    service = SubscriptionService()
-    try:
-        sub = db.get_subscription(sid)
-        if not sub:
-            return error_reply("Subscription not found")
-        upd = SubscriptionUpdate.model_validate(payload)
-        update_data: dict[str, Any] = {}
-        if upd.name is not None:
-            update_data["name"] = upd.name
-        if upd.url is not None:
-            normalized_url = service._normalize_url(str(upd.url))
-            update_data["url"] = normalized_url
-        updated = db.update_subscription(sid, update_data)
-        return {
-            "success": True,
-            "message": "Subscription updated successfully",
-            "id": str(updated.id),
-            "name": updated.name,
-        }
-    finally:
-        service.close()
+    sub = db.get_subscription(sid)
+    if not sub:
+        return error_reply("Subscription not found")
+    upd = validate_payload(SubscriptionUpdate, payload)
+    update_data: dict[str, Any] = {}
+    if upd.name is not None:
+        update_data["name"] = upd.name
+    if upd.url is not None:
+        normalized_url = _get_service()._normalize_url(str(upd.url))
+        update_data["url"] = normalized_url
+    updated = db.update_subscription(sid, update_data)
+    refresh_cached(sid, updated)
+    return {
+        "success": True,
+        "message": "Subscription updated successfully",
+        "id": updated.id,
+        "name": updated.name,
+    }
 
 
 def delete_subscription(subscription_id: str) -> dict[str, Any]:
@@ -125,12 +206,13 @@ def delete_subscription(subscription_id: str) -> dict[str, Any]:
     if not sub:
         return error_reply("Subscription not found")
     ok = db.delete_subscription(sid)
+    refresh_cached(sid)
     if not ok:
         return error_reply("Failed to delete subscription")
     return {
         "success": True,
         "message": f"Subscription '{sub.name}' deleted successfully",
-        "id": str(sub.id),
+        "id": sub.id,
         "name": sub.name,
     }
 
@@ -138,25 +220,33 @@ def delete_subscription(subscription_id: str) -> dict[str, Any]:
 def refresh_subscription_servers(subscription_id: str) -> dict[str, Any]:
     """Refresh servers for a subscription."""
     sid = to_uuid(subscription_id)
-    service = SubscriptionService()
-    try:
-        sub = db.get_subscription(sid)
-        if not sub:
-            return error_reply("Subscription not found")
-        settings = db.get_settings()
-        updated = service.update_subscription_servers(
-            sub,
-            settings.socks_port,
-            settings.http_port,
+    sub = db.get_subscription(sid)
+    if not sub:
+        return error_reply("Subscription not found")
+    settings = db.get_settings()
+    updated = _get_service().update_subscription_servers(
+        sub,
+        settings.socks_port,
+        settings.http_port,
+    )
+
+    if updated is sub:
+        # Upstream answered 304 Not Modified and nothing needs saving
+        message = f"Subscription '{sub.name}' is already up to date"
+    else:
+        saved = db.update_subscription_with_user_info(
+            sid,
+            updated.servers,
+            updated.user_info,
+            etag=updated.etag,
+            last_modified=updated.last_modified,
         )
-
-        db.update_subscription_with_user_info(sid, updated.servers, updated.user_info)
-        return {
-            "success": True,
-            "message": f"Subscription '{sub.name}' updated successfully",
-            "id": str(sid),
-            "server_count": len(updated.servers),
-            "last_updated": updated.last_updated.isoformat() if updated.last_updated else None,
-        }
-    finally:
-        service.close()
+        refresh_cached(sid, saved)
+        message = f"Subscription '{sub.name}' updated successfully"
+    return {
+        "success": True,
+        "message": message,
+        "id": sid,
+        "server_count": len(updated.servers),
+        "last_updated": updated.last_updated.isoformat() if updated.last_updated else None,
+    }
@@ -1,23 +1,37 @@
 """Update operations."""
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
+from app.ops._cache import TTLCache
 from app.ops.utils import error_reply
 from app.services.process_service import process_manager
+from app.services.task_runner import TaskConflictError, task_registry
 from app.services.xray_update_service import GeodataUpdateService, XrayUpdateService
 
 logger = logging.getLogger(__name__)
 
+# GitHub release data changes rarely, so keep it for a few minutes between UI visits
+_release_cache = TTLCache(ttl=300)
+
 
 def get_xray_version_info() -> dict[str, Any]:
     """Get Xray version information."""
     service = XrayUpdateService()
     try:
-        xray_info = process_manager.check_xray_availability()
-        current_version = xray_info.get("version")
-        latest_version = service.get_latest_version()
-        version_sizes = service.get_available_versions_with_sizes(limit=10)
+        # The local version probe and both GitHub requests are independent, so run them together
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            xray_info_future = executor.submit(process_manager.check_xray_availability)
+            latest_future = executor.submit(_release_cache.get_or_build, "latest", service.get_latest_version)
+            sizes_future = executor.submit(
+                _release_cache.get_or_build,
+                "sizes",
+                lambda: service.get_available_versions_with_sizes(limit=10),
+            )
+            current_version = xray_info_future.result().get("version")
+            latest_version = latest_future.result()
+            version_sizes = sizes_future.result()
         available_versions = [{"version": ver, "size_bytes": version_sizes.get(ver)} for ver in version_sizes]
         return {
             "current_version": current_version,
@@ -29,69 +43,80 @@ def get_xray_version_info() -> dict[str, Any]:
 
 
 def update_xray(payload: dict[str, Any]) -> dict[str, Any]:
-    """Update Xray to specified or latest version."""
-    service = XrayUpdateService()
+    """Start updating Xray to the specified or latest version in the background."""
     try:
-        request_version = payload.get("version")
-        xray_info = process_manager.check_xray_availability()
-        xray_binary = process_manager.get_effective_xray_binary()
-        current_version = xray_info.get("version")
-
-        if request_version:
-            available = service.get_available_versions(limit=50)
-            if request_version not in available and f"v{request_version}" not in available:
-                return error_reply(f"Version {request_version} is not available")
-        else:
-            request_version = service.get_latest_version()
-
-        if current_version and current_version == request_version:
-            return {
-                "success": True,
-                "message": f"Xray is already up to date (version {request_version})",
-                "version": request_version,
-                "current_version": current_version,
-            }
-
-        ok = service.download_xray(request_version, xray_binary)
-        if ok:
-            # Restart currently running server
-            try:
-                if process_manager.current_server_id and process_manager.is_server_running(
-                    process_manager.current_server_id,
-                ):
-                    server_info = process_manager.running_processes.get(
-                        process_manager.current_server_id,
-                    )
-                    if server_info:
-                        process_manager.stop_server(process_manager.current_server_id)
-                        process_manager.start_single_server(
-                            server_info.server_id,
-                            server_info.subscription_id,
-                            server_info.config,
-                        )
-
-            except Exception as e:
-                logger.exception(f"Failed to restart server after xray update: {e}")
-
-            return {
-                "success": True,
-                "message": f"Successfully updated Xray to version {request_version}",
-                "version": request_version,
-                "current_version": current_version,
-            }
-        return error_reply("Update failed")
-    finally:
-        pass
+        task_id = task_registry.submit(_update_xray, payload, kind="update_xray")
+    except TaskConflictError:
+        return error_reply("Another Xray update is already in progress")
+    return {
+        "success": True,
+        "message": "Xray update started",
+        "status": "in_progress",
+        "task_id": task_id,
+    }
+
+
+def _update_xray(payload: dict[str, Any]) -> dict[str, Any]:
+    service = XrayUpdateService()
+    request_version = payload.get("version")
+    xray_info = process_manager.check_xray_availability()
+    xray_binary = process_manager.get_effective_xray_binary()
+    current_version = xray_info.get("version")
+
+    if request_version:
+        available = service.get_available_versions(limit=50)
+        if request_version not in available and f"v{request_version}" not in available:
+            return error_reply(f"Version {request_version} is not available")
+    else:
+        request_version = service.get_latest_version()
+
+    if current_version and current_version == request_version:
+        return {
+            "success": True,
+            "message": f"Xray is already up to date (version {request_version})",
+            "version": request_version,
+            "current_version": current_version,
+        }
+
+    ok = service.download_xray(request_version, xray_binary)
+    if ok:
+        _release_cache.clear()
+        # Restart currently running server
+        try:
+            process_manager.restart_current()
+        except Exception as e:
+            logger.exception("Failed to restart server after xray update: %s", e)
+
+        return {
+            "success": True,
+            "message": f"Successfully updated Xray to version {request_version}",
+            "version": request_version,
+            "current_version": current_version,
+        }
+    return error_reply("Update failed")
 
 
 def update_geodata() -> dict[str, Any]:
-    """Update Xray geodata files."""
-    service = GeodataUpdateService()
+    """Start updating Xray geodata files in the background."""
     assets_folder = process_manager.get_xray_assets_folder()
     if not assets_folder:
         return error_reply(
             "Xray assets folder is not configured. Please set it in settings first.",
         )
+    try:
+        task_id = task_registry.submit(_update_geodata, assets_folder, kind="update_geodata")
+    except TaskConflictError:
+        return error_reply("Another geodata update is already in progress")
+    return {
+        "success": True,
+        "message": "Geodata update started",
+        "status": "in_progress",
+        "task_id": task_id,
+    }
+
+
+def _update_geodata(assets_folder: str) -> dict[str, Any]:
+    service = GeodataUpdateService()
     results = service.update_geodata(assets_folder)
     all_success = all(results.values())
     failed_files = [k for k, v in results.items() if not v]
@@ -102,21 +127,33 @@ def update_geodata() -> dict[str, Any]:
     )
     # Restart current server if any
     try:
-        if process_manager.is_any_server_running():
-            process_manager.stop_current_server()
-            info = process_manager.get_current_server_info()
-            if info:
-                process_manager.start_single_server(
-                    info.server_id,
-                    info.subscription_id,
-                    info.config,
-                )
-
+        process_manager.restart_current()
     except Exception as e:
-        logger.exception(f"Failed to restart server after geodata update: {e}")
+        logger.exception("Failed to restart server after geodata update: %s", e)
     return {
         "success": all_success,
         "message": message,
         "updated_files": results,
         "assets_folder": assets_folder,
     }
+
+
+def get_update_status(task_id: str) -> dict[str, Any]:
+    """Get the state of an update started by update_xray or update_geodata."""
+    future = task_registry.get(task_id)
+    if future is None:
+        return error_reply("Update task not found")
+    if not future.done():
+        return {
+            "success": True,
+            "message": "Update in progress",
+            "status": "in_progress",
+            "task_id": task_id,
+        }
+
+    task_registry.forget(task_id)
+    exc = future.exception()
+    if exc is not None:
+        return {**error_reply(f"Update failed: {exc!s}"), "status": "error", "task_id": task_id}
+    result = future.result()
+    return {**result, "status": "done" if result.get("success") else "error", "task_id": task_id}
@@ -1,28 +1,49 @@
 """Common utilities for ops modules."""
 
+import atexit
 import logging
+import os
 import platform
 import re
+import shlex
+import shutil
 import subprocess
-from typing import Any, Dict
+from collections.abc import Iterator
+from functools import cache, lru_cache
+from typing import Any
 from uuid import UUID
 
 import netifaces
-from pydantic import ValidationError
+from pydantic import BaseModel, ValidationError
 
-# only for Windows
-try:
-    import ctypes
-    import winreg
-except ImportError:
-    pass
+# Windows only; winreg and ctypes are imported where they are used
+INTERNET_SETTINGS_KEY = r"Software\Microsoft\Windows\CurrentVersion\Internet Settings"
+INTERNET_OPTION_SETTINGS_CHANGED = 39
+INTERNET_OPTION_REFRESH = 37
 
 logger = logging.getLogger(__name__)
 
+# The OS doesn't change at runtime, and platform.system() can spawn a subprocess on Windows
+_OS_NAME = platform.system()
+
+
+@lru_cache(maxsize=4096)
+def _hex_id(value: str) -> str:
+    return UUID(value).hex
+
+
+def to_uuid(value: Any) -> str:
+    """Validate a UUID value and return it as a 32-char hex id."""
+    if type(value) is str:
+        return _hex_id(value)
+    return value.hex if isinstance(value, UUID) else _hex_id(str(value))
 
-def to_uuid(value: Any) -> UUID:
-    """Convert value to UUID."""
-    return value if isinstance(value, UUID) else UUID(str(value))
+
+def validate_payload[M: BaseModel](model: type[M], payload: str | bytes | dict[str, Any]) -> M:
+    """Validate a payload from the UI, parsing JSON strings straight into the model."""
+    if isinstance(payload, (str, bytes)):
+        return model.model_validate_json(payload)
+    return model.model_validate(payload)
 
 
 def error_reply(message: str, data: dict[str, Any] | None = None) -> dict[str, Any]:
@@ -30,16 +51,39 @@ def error_reply(message: str, data: dict[str, Any] | None = None) -> dict[str, A
     return {"success": False, "message": message, "data": data or {}}
 
 
-def validation_error_reply(e: ValidationError) -> Dict[str, Any]:
+def validation_error_reply(e: ValidationError) -> dict[str, Any]:
     """Create validation error response from ValidationError."""
-    err_msg = ""
-    for error in e.errors():
-        err_msg += f"{', '.join(error['loc'])}: {error['msg']}\n"
-    err_msg = err_msg.strip()
-    return error_reply(err_msg)
+    lines = [f"{', '.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()]
+    return error_reply("\n".join(lines))
+
+
+@cache
+def _which(tool: str) -> str | None:
+    """Return the full path of a command-line tool on PATH, or None."""
+    return shutil.which(tool)
+
+
+def _have(tool: str) -> bool:
+    """Return True if the command-line tool is on PATH."""
+    return _which(tool) is not None
 
 
-def get_default_network_service_mac_os() -> str:
+# close_fds stays at its default: the GUI toolkits loaded in this process open fds from C that
+# Python can't mark non-inheritable, and they must not leak into the helper tools.
+_SPAWN = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+
+
+def _run_chain(*commands: list[str]) -> None:
+    """Run commands one after another in a single shell, stopping at the first failure."""
+    script = " && ".join(shlex.join(command) for command in commands)
+    subprocess.check_call(["/bin/sh", "-c", script], **_SPAWN)
+
+
+_SERVICE_LINE = re.compile(r"\((\d+|\*)\)\s+(.+)")
+_DEVICE_LINE = re.compile(r"Device:\s*([a-zA-Z0-9]+)")
+
+
+def get_default_network_service_mac_os() -> str | None:
     """
     Get the default network service for macOS by matching the default interface from netifaces.gateways()
     with the output of 'networksetup -listnetworkserviceorder'. If no match, just return the first service in order.
@@ -55,287 +99,306 @@ def get_default_network_service_mac_os() -> str:
                 default_iface = gateway_info[1]
                 break
 
-    # Parse networksetup -listnetworkserviceorder for mapping of service name <-> device
+    # Walk networksetup -listnetworkserviceorder as it streams in, stopping at the default interface
+    first_service = None
+    current_service = None
     try:
-        order_output = subprocess.check_output(["networksetup", "-listnetworkserviceorder"]).decode(errors="ignore")
+        with subprocess.Popen(
+            [_which("networksetup") or "networksetup", "-listnetworkserviceorder"],
+            stdout=subprocess.PIPE,
+            text=True,
+            errors="ignore",
+        ) as proc:
+            for line in proc.stdout:
+                # Match service name line: (1) Wi-Fi, or (*) Wi-Fi for a disabled service
+                m = _SERVICE_LINE.match(line)
+                if m:
+                    current_service = None if m.group(1) == "*" else m.group(2).strip()
+                    if current_service and first_service is None:
+                        first_service = current_service
+                    continue
+                # Match device line: (Hardware Port: Wi-Fi, Device: en0)
+                m = _DEVICE_LINE.search(line)
+                if m and current_service and m.group(1) == default_iface:
+                    return current_service
     except Exception as e:
-        logging.warning(f"Failed to run networksetup -listnetworkserviceorder: {e}")
-        order_output = ""
+        logger.warning("Failed to run networksetup -listnetworkserviceorder: %s", e)
 
-    # Build mapping: device -> service name
-    device_to_service = {}
-    service_order = []
-    current_service = None
-    for line in order_output.splitlines():
-        # Match service name line: (1) Wi-Fi
-        m = re.match(r"\(\d+\)\s+(.+)", line)
-        if m:
-            current_service = m.group(1).strip()
-            service_order.append(current_service)
-            continue
-        # Match device line: (Hardware Port: Wi-Fi, Device: en0)
-        m = re.search(r"Device:\s*([a-zA-Z0-9]+)", line)
-        if m and current_service:
-            device = m.group(1).strip()
-            device_to_service[device] = current_service
-
-    # Try to match default interface to a service
-    if default_iface and default_iface in device_to_service:
-        return device_to_service[default_iface]
-
-    # If not found, just return service_order[0] if available
-    if service_order:
-        return service_order[0]
-
-    return None
+    # If not found, just return the first enabled service in order, if any
+    return first_service
 
 
-def set_socks_system_proxy(ip_address, port):
-    os_name = platform.system()
-    proxy_str = f"{ip_address}:{port}"
+def _linux_desktops() -> Iterator[str]:
+    """Yield the desktops whose proxy settings should be written.
+
+    When XDG_CURRENT_DESKTOP names KDE or GNOME only that desktop is tried, so a
+    failure there doesn't leave the other desktop's settings half changed.
+    """
+    backends = [("KDE", _kwriteconfig), ("GNOME", lambda: _which("gsettings"))]
+    current = os.environ.get("XDG_CURRENT_DESKTOP", "").upper()
+    if "KDE" in current:
+        backends = backends[:1]
+    elif "GNOME" in current or "UNITY" in current:
+        backends = backends[1:]
+    # Tools are probed lazily, so a desktop that is applied first spares the other probe
+    return (desktop for desktop, find_tool in backends if find_tool())
 
-    logging.info(f"Setting system SOCKS proxy on {os_name} -> {proxy_str}")
 
-    # --- Windows ---
-    if os_name == "Windows":
+def _kwriteconfig() -> str | None:
+    """Return the kwriteconfig of the installed Plasma, preferring Plasma 6, or None."""
+    return _which("kwriteconfig6") or _which("kwriteconfig5")
+
+
+def _apply_kde_proxy(proxy_type: str, socks_proxy: str) -> None:
+    """Write the KDE proxy settings to kioslaverc and tell KIO to reload them."""
+    # kwriteconfig edits only these keys and keeps the rest of the file as KDE wrote it
+    kwriteconfig = _kwriteconfig()
+    group = [kwriteconfig, "--file", "kioslaverc", "--group", "Proxy Settings", "--key"]
+    _run_chain([*group, "ProxyType", proxy_type], [*group, "SocksProxy", socks_proxy])
+
+    if _have("qdbus"):
+        subprocess.call(
+            [_which("qdbus"), "org.kde.kioslave.kssld5", "/KSSL", "reparseSlaveConfiguration"],
+            **_SPAWN,
+        )
+
+
+def _apply_gnome_proxy(mode: str, host: str, port: int) -> None:
+    """Write the GNOME proxy settings, in process through Gio when PyGObject is available."""
+    try:
+        from gi.repository import Gio
+    except ImportError:
+        Gio = None
+
+    # Gio.Settings.new() aborts the process on an unknown schema, so check for it first
+    source = Gio.SettingsSchemaSource.get_default() if Gio else None
+    if source is None or source.lookup("org.gnome.system.proxy", True) is None:
+        # Point the proxy at the new address before switching it on
+        _run_chain(
+            ["gsettings", "set", "org.gnome.system.proxy.socks", "host", host],
+            ["gsettings", "set", "org.gnome.system.proxy.socks", "port", str(port)],
+            ["gsettings", "set", "org.gnome.system.proxy", "mode", mode],
+        )
+        return
+
+    socks = Gio.Settings.new("org.gnome.system.proxy.socks")
+    proxy = Gio.Settings.new("org.gnome.system.proxy")
+    if (proxy.get_string("mode"), socks.get_string("host"), socks.get_int("port")) == (mode, host, port):
+        return
+
+    socks.set_string("host", host)
+    socks.set_int("port", port)
+    proxy.set_string("mode", mode)
+    Gio.Settings.sync()
+
+
+_proxy_key = None
+
+
+def _open_proxy_key():
+    """Get the Internet Settings registry key, opening it on first use and keeping it open."""
+    import winreg
+
+    global _proxy_key
+    if _proxy_key is None:
+        _proxy_key = winreg.OpenKey(
+            winreg.HKEY_CURRENT_USER,
+            INTERNET_SETTINGS_KEY,
+            0,
+            winreg.KEY_READ | winreg.KEY_WRITE,
+        )
+        atexit.register(winreg.CloseKey, _proxy_key)
+    return _proxy_key
+
+
+@lru_cache(maxsize=1)
+def _internet_set_option():
+    """Bind WinINet's InternetSetOptionW once, with its signature declared."""
+    import ctypes
+    from ctypes import wintypes
+
+    func = ctypes.WinDLL("wininet", use_last_error=True).InternetSetOptionW
+    func.argtypes = [ctypes.c_void_p, wintypes.DWORD, ctypes.c_void_p, wintypes.DWORD]
+    func.restype = wintypes.BOOL
+    return func
+
+
+def _registry_value(key, name: str) -> Any:
+    """Read a registry value, or None if it doesn't exist."""
+    import winreg
+
+    try:
+        return winreg.QueryValueEx(key, name)[0]
+    except FileNotFoundError:
+        return None
+
+
+def _notify_proxy_change() -> None:
+    """Tell WinINet clients to reload the proxy settings from the registry."""
+    internet_set_option = _internet_set_option()
+    internet_set_option(None, INTERNET_OPTION_SETTINGS_CHANGED, None, 0)
+    internet_set_option(None, INTERNET_OPTION_REFRESH, None, 0)
+
+
+# --- Windows ---
+def _set_socks_windows(ip_address, port) -> None:
+    import winreg
+
+    values = {
+        "ProxyEnable": (winreg.REG_DWORD, 1),
+        "ProxyServer": (winreg.REG_SZ, f"socks={ip_address}:{port}"),
+        "ProxyOverride": (winreg.REG_SZ, "<local>"),
+    }
+    try:
+        key = _open_proxy_key()
+        # Only write the values that differ; ProxyOverride rarely does
+        changed = {name: value for name, value in values.items() if _registry_value(key, name) != value[1]}
+        if not changed:
+            logger.info("Windows SOCKS proxy already set.")
+            return
+
+        for name, (value_type, value) in changed.items():
+            winreg.SetValueEx(key, name, 0, value_type, value)
+
+        _notify_proxy_change()
+
+        logger.info("Windows SOCKS proxy applied.")
+    except Exception as e:
+        logger.error("Failed to set Windows proxy: %s", e)
+
+
+def _clear_socks_windows() -> None:
+    import winreg
+
+    try:
+        key = _open_proxy_key()
+        winreg.SetValueEx(key, "ProxyEnable", 0, winreg.REG_DWORD, 0)
         try:
-            key = winreg.OpenKey(
-                winreg.HKEY_CURRENT_USER,
-                r"Software\Microsoft\Windows\CurrentVersion\Internet Settings",
-                0,
-                winreg.KEY_WRITE,
-            )
-            winreg.SetValueEx(key, "ProxyEnable", 0, winreg.REG_DWORD, 1)
-            winreg.SetValueEx(key, "ProxyServer", 0, winreg.REG_SZ, f"socks={proxy_str}")
-            winreg.SetValueEx(key, "ProxyOverride", 0, winreg.REG_SZ, "<local>")
-            winreg.CloseKey(key)
-
-            # Notify system
-            ctypes.windll.Wininet.InternetSetOptionW(0, 39, 0, 0)
-            ctypes.windll.Wininet.InternetSetOptionW(0, 37, 0, 0)
-
-            logging.info("Windows SOCKS proxy applied.")
-        except Exception as e:
-            logging.error(f"Failed to set Windows proxy: {e}")
+            winreg.DeleteValue(key, "ProxyServer")
+        except FileNotFoundError:
+            pass
+
+        _notify_proxy_change()
+        logger.info("Windows proxy cleared.")
+    except Exception as e:
+        logger.error("Failed to clear Windows proxy: %s", e)
+
+
+# --- macOS ---
+def _get_socks_darwin(service: str) -> dict[str, str]:
+    """Read a network service's SOCKS proxy settings, e.g. {"Enabled": "Yes", "Server": ..., "Port": ...}."""
+    output = subprocess.run(
+        [_which("networksetup") or "networksetup", "-getsocksfirewallproxy", service],
+        capture_output=True,
+        text=True,
+        errors="ignore",
+        check=True,
+    ).stdout
+    settings = {}
+    for line in output.splitlines():
+        name, sep, value = line.partition(":")
+        if sep:
+            settings[name.strip()] = value.strip()
+    return settings
+
+
+def _set_socks_darwin(ip_address, port) -> None:
+    try:
+        service = get_default_network_service_mac_os()
+        if not service:
+            logger.warning("No default network service found for macOS")
+            return
+
+        # Read the settings back, the user or another app may have changed them since
+        current = _get_socks_darwin(service)
+        if (current.get("Enabled"), current.get("Server"), current.get("Port")) == ("Yes", ip_address, str(port)):
+            logger.info("macOS SOCKS proxy already set.")
+            return
+
+        _run_chain(
+            ["networksetup", "-setsocksfirewallproxy", service, ip_address, str(port)],
+            ["networksetup", "-setsocksfirewallproxystate", service, "on"],
+        )
+
+        logger.info("macOS SOCKS proxy applied.")
+    except Exception as e:
+        logger.error("Failed to set macOS proxy: %s", e)
+
+
+def _clear_socks_darwin() -> None:
+    try:
+        service = get_default_network_service_mac_os()
+        if not service:
+            logger.warning("No default network service found for macOS")
+            return
+
+        subprocess.check_call(
+            [_which("networksetup") or "networksetup", "-setsocksfirewallproxystate", service, "off"],
+            **_SPAWN,
+        )
 
-    # --- macOS ---
-    elif os_name == "Darwin":
+        logger.info("macOS proxy cleared.")
+    except Exception as e:
+        logger.error("Failed to clear macOS proxy: %s", e)
+
+
+# --- Linux ---
+def _set_socks_linux(ip_address, port) -> None:
+    for desktop in _linux_desktops():
         try:
-            service = get_default_network_service_mac_os()
-            if not service:
-                logging.warning("No default network service found for macOS")
-                return
-
-            subprocess.run(
-                [
-                    "networksetup",
-                    "-setsocksfirewallproxy",
-                    service,
-                    ip_address,
-                    str(port),
-                ],
-                check=True,
-            )
-
-            subprocess.run(
-                ["networksetup", "-setsocksfirewallproxystate", service, "on"],
-                check=True,
-            )
-
-            logging.info("macOS SOCKS proxy applied.")
+            if desktop == "KDE":
+                _apply_kde_proxy("1", f"{ip_address}:{port}")
+            else:
+                _apply_gnome_proxy("manual", ip_address, int(port))
+            logger.info("Linux %s SOCKS proxy applied.", desktop)
+            return
         except Exception as e:
-            logging.error(f"Failed to set macOS proxy: {e}")
-
-    # --- Linux ---
-    elif os_name == "Linux":
-        # KDE
-        if subprocess.getstatusoutput("which kwriteconfig5")[0] == 0:
-            try:
-                subprocess.run(
-                    [
-                        "kwriteconfig5",
-                        "--file",
-                        "kioslaverc",
-                        "--group",
-                        "Proxy Settings",
-                        "--key",
-                        "ProxyType",
-                        "1",
-                    ],
-                    check=True,
-                )
-                subprocess.run(
-                    [
-                        "kwriteconfig5",
-                        "--file",
-                        "kioslaverc",
-                        "--group",
-                        "Proxy Settings",
-                        "--key",
-                        "SocksProxy",
-                        proxy_str,
-                    ],
-                    check=True,
-                )
-                subprocess.run(
-                    [
-                        "qdbus",
-                        "org.kde.kioslave.kssld5",
-                        "/KSSL",
-                        "reparseSlaveConfiguration",
-                    ],
-                    check=False,
-                )
-                logging.info("Linux KDE SOCKS proxy applied.")
-                return
-            except Exception as e:
-                logging.warning(f"KDE proxy setup failed: {e}")
-
-        # GNOME
-        if subprocess.getstatusoutput("which gsettings")[0] == 0:
-            try:
-                subprocess.run(
-                    ["gsettings", "set", "org.gnome.system.proxy", "mode", "manual"],
-                    check=True,
-                )
-                subprocess.run(
-                    [
-                        "gsettings",
-                        "set",
-                        "org.gnome.system.proxy.socks",
-                        "host",
-                        ip_address,
-                    ],
-                    check=True,
-                )
-                subprocess.run(
-                    [
-                        "gsettings",
-                        "set",
-                        "org.gnome.system.proxy.socks",
-                        "port",
-                        str(port),
-                    ],
-                    check=True,
-                )
-                logging.info("Linux GNOME SOCKS proxy applied.")
-                return
-            except Exception as e:
-                logging.warning(f"GSettings setup failed: {e}")
-
-        logging.warning("No GUI proxy manager found for Linux; SOCKS proxy not applied.")
-
-    else:
-        logging.warning(f"Unsupported OS: {os_name}")
+            logger.warning("%s proxy setup failed: %s", desktop, e)
 
+    logger.warning("No GUI proxy manager found for Linux; SOCKS proxy not applied.")
 
-def clear_socks_system_proxy():
-    os_name = platform.system()
-    logging.info(f"Clearing system SOCKS proxy on {os_name}")
 
-    # --- Windows ---
-    if os_name == "Windows":
+def _clear_socks_linux() -> None:
+    for desktop in _linux_desktops():
         try:
-            key = winreg.OpenKey(
-                winreg.HKEY_CURRENT_USER,
-                r"Software\Microsoft\Windows\CurrentVersion\Internet Settings",
-                0,
-                winreg.KEY_WRITE,
-            )
-            winreg.SetValueEx(key, "ProxyEnable", 0, winreg.REG_DWORD, 0)
-            try:
-                winreg.DeleteValue(key, "ProxyServer")
-            except FileNotFoundError:
-                pass
-            winreg.CloseKey(key)
-
-            ctypes.windll.Wininet.InternetSetOptionW(0, 39, 0, 0)
-            ctypes.windll.Wininet.InternetSetOptionW(0, 37, 0, 0)
-            logging.info("Windows proxy cleared.")
+            if desktop == "KDE":
+                _apply_kde_proxy("0", "")
+            else:
+                _apply_gnome_proxy("none", "", 0)
+            logger.info("Linux %s proxy cleared.", desktop)
+            return
         except Exception as e:
-            logging.error(f"Failed to clear Windows proxy: {e}")
+            logger.warning("%s proxy clear failed: %s", desktop, e)
 
-    # --- macOS ---
-    elif os_name == "Darwin":
-        try:
-            service = get_default_network_service_mac_os()
-            if not service:
-                logging.warning("No default network service found for macOS")
-                return
+    logger.warning("No GUI proxy manager found for Linux; nothing to clear.")
 
-            subprocess.run(
-                ["networksetup", "-setsocksfirewallproxystate", service, "off"],
-                check=True,
-            )
 
-            logging.info("macOS proxy cleared.")
-        except Exception as e:
-            logging.error(f"Failed to clear macOS proxy: {e}")
-
-    # --- Linux ---
-    elif os_name == "Linux":
-        if subprocess.getstatusoutput("which kwriteconfig5")[0] == 0:
-            try:
-                subprocess.run(
-                    [
-                        "kwriteconfig5",
-                        "--file",
-                        "kioslaverc",
-                        "--group",
-                        "Proxy Settings",
-                        "--key",
-                        "ProxyType",
-                        "0",
-                    ],
-                    check=True,
-                )
-                subprocess.run(
-                    [
-                        "kwriteconfig5",
-                        "--file",
-                        "kioslaverc",
-                        "--group",
-                        "Proxy Settings",
-                        "--key",
-                        "SocksProxy",
-                        "",
-                    ],
-                    check=True,
-                )
-                subprocess.run(
-                    [
-                        "qdbus",
-                        "org.kde.kioslave.kssld5",
-                        "/KSSL",
-                        "reparseSlaveConfiguration",
-                    ],
-                    check=False,
-                )
-                logging.info("Linux KDE proxy cleared.")
-                return
-            except Exception as e:
-                logging.warning(f"KDE proxy clear failed: {e}")
-
-        if subprocess.getstatusoutput("which gsettings")[0] == 0:
-            try:
-                subprocess.run(
-                    ["gsettings", "set", "org.gnome.system.proxy", "mode", "none"],
-                    check=True,
-                )
-                subprocess.run(
-                    ["gsettings", "set", "org.gnome.system.proxy.socks", "host", ""],
-                    check=True,
-                )
-                subprocess.run(
-                    ["gsettings", "set", "org.gnome.system.proxy.socks", "port", "0"],
-                    check=True,
-                )
-                logging.info("Linux GNOME proxy cleared.")
-                return
-            except Exception as e:
-                logging.warning(f"GSettings clear failed: {e}")
-
-        logging.warning("No GUI proxy manager found for Linux; nothing to clear.")
-
-    else:
-        logging.warning(f"Unsupported OS: {os_name}")
+def _set_socks_unsupported(ip_address, port) -> None:
+    logger.warning("Unsupported OS: %s", _OS_NAME)
+
+
+def _clear_socks_unsupported() -> None:
+    logger.warning("Unsupported OS: %s", _OS_NAME)
+
+
+# Resolve the platform implementations once, since the OS can't change at runtime
+_set_socks = {
+    "Windows": _set_socks_windows,
+    "Darwin": _set_socks_darwin,
+    "Linux": _set_socks_linux,
+}.get(_OS_NAME, _set_socks_unsupported)
+_clear_socks = {
+    "Windows": _clear_socks_windows,
+    "Darwin": _clear_socks_darwin,
+    "Linux": _clear_socks_linux,
+}.get(_OS_NAME, _clear_socks_unsupported)
+
+
+def set_socks_system_proxy(ip_address, port):
+    logger.info("Setting system SOCKS proxy on %s -> %s:%s", _OS_NAME, ip_address, port)
+    _set_socks(ip_address, port)
+
+
+def clear_socks_system_proxy():
+    logger.info("Clearing system SOCKS proxy on %s", _OS_NAME)
+    _clear_socks()
@@ -1,77 +1,381 @@
 """Xray-core process management service."""
 
+import errno
 import json
 import logging
 import os
 import platform
+import re
+import select
+import selectors
+import struct
 import subprocess
 import threading
 import time
+from collections import deque
 from collections.abc import Generator
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from queue import Empty, Queue
-from random import randint
+from functools import lru_cache
 from shutil import which
-from socket import AF_INET, SOCK_STREAM, socket
+from socket import AF_INET, SO_ERROR, SOCK_STREAM, SOL_SOCKET, socket
+from typing import TYPE_CHECKING, TypedDict
 from uuid import UUID
 
-import netifaces
-from requests import get as http_get
-from requests.exceptions import RequestException, Timeout
-
 from app.database import db
-from app.models.database import ProcessInfo
+from app.models.database import ProcessInfo, SettingsModel
+
+if TYPE_CHECKING:
+    from requests import Session
 
 logger = logging.getLogger(__name__)
 
+SYSTEM = platform.system()
+# On Windows, hide the console window of xray processes
+CREATIONFLAGS = subprocess.CREATE_NO_WINDOW if SYSTEM == "Windows" else 0
+
+# Patterns for parsing `xray version` output
+_XRAY_VERSION_RE = re.compile(
+    r"^Xray\s+([0-9]+\.[0-9]+\.[0-9]+)[^\n]*?(?:\s+([0-9a-f]{7,}))?\s*\((go[0-9.]+)\s+([^\s)]+)\)",
+    re.MULTILINE,
+)
+_GO_VERSION_RE = re.compile(r"go version ([^\s]+)", re.IGNORECASE)
+_ARCH_RE = re.compile(r"(amd64|arm64|386|arm)")
+
+# How long a started xray process is watched for an immediate exit
+STARTUP_PROBE_TIME = 0.1
+# How long a detected default network interface is reused before probing again
+NETWORK_CACHE_TTL = 30.0
+# Most bytes read from an xray output pipe at once
+LOG_READ_SIZE = 65536
+# Most log entries kept per server for the GUI
+LOG_BUFFER_SIZE = 200
+# Longest wait for the log reader to reach the end of an exited process's output
+EXIT_OUTPUT_TIMEOUT = 1.0
+# Longest a log stream waits for new output before checking that its server is still alive
+LOG_IDLE_TIMEOUT = 30.0
+# How long settings read from the database are reused; writes invalidate them right away
+SETTINGS_CACHE_TTL = 2.0
+# Fetched through a server's proxy to measure its latency. It's deliberately left as a hostname:
+# the proxy resolves it on the remote side, which a locally resolved (possibly poisoned) IP would bypass.
+CONNECTIVITY_TEST_URL = "http://gstatic.com/generate_204"
+# Most servers tested at once; a test mostly waits on xray and the network, not the CPU
+CONNECTIVITY_TEST_WORKERS = 16
+
+
+class LogEntry(TypedDict):
+    """A log line as handed to the GUI."""
+
+    timestamp: str
+    epoch_ms: int
+    message: str
+
+
+def _format_log_entry(entry: dict) -> LogEntry:
+    """Turn a buffered log entry into what the GUI gets, formatting its timestamp."""
+    time_ns = entry["time_ns"]
+    return {
+        "timestamp": datetime.fromtimestamp(time_ns / 1e9).isoformat(),
+        "epoch_ms": time_ns // 1_000_000,
+        "message": entry["message"],
+    }
+
+
+def _cow(parent: dict, key: str) -> dict:
+    """Replace parent[key] with a shallow copy of itself, or a new dict if missing, and return it.
+
+    Runtime overrides copy only the dicts on the path they change, so the
+    stored server config is never mutated and the rest of it is shared.
+    """
+    child = dict(parent.get(key) or {})
+    parent[key] = child
+    return child
+
+
+def _netlink_ipv4_interfaces() -> list[str]:
+    """List interfaces with a non-loopback IPv4 address from a single RTM_GETADDR dump (Linux only)."""
+    from socket import AF_NETLINK, NETLINK_ROUTE, SOCK_RAW, if_indextoname
+
+    rtm_newaddr, rtm_getaddr = 20, 22
+    nlmsg_error, nlmsg_done = 2, 3
+    nlm_f_request, nlm_f_dump = 0x1, 0x300
+    ifa_local, ifa_address = 2, 1
+
+    request = struct.pack("=IHHII", 24, rtm_getaddr, nlm_f_request | nlm_f_dump, 1, 0)
+    request += struct.pack("=BBBBI", AF_INET, 0, 0, 0, 0)
+
+    addresses: dict[int, list[bytes]] = {}
+    with socket(AF_NETLINK, SOCK_RAW, NETLINK_ROUTE) as sock:
+        sock.sendto(request, (0, 0))
+        while True:
+            data = sock.recv(65536)
+            offset = 0
+            while offset + 16 <= len(data):
+                msg_len, msg_type, _flags, _seq, _pid = struct.unpack_from("=IHHII", data, offset)
+                if msg_len < 16:
+                    msg = "malformed netlink message"
+                    raise OSError(msg)
+                if msg_type == nlmsg_done:
+                    return [if_indextoname(index) for index, ips in addresses.items() if ips]
+                if msg_type == nlmsg_error:
+                    msg = "netlink address dump failed"
+                    raise OSError(msg)
+                if msg_type == rtm_newaddr:
+                    index = struct.unpack_from("=I", data, offset + 20)[0]
+                    # Walk the rtattrs after the 16-byte header and 8-byte ifaddrmsg
+                    attr = offset + 24
+                    while attr + 4 <= offset + msg_len:
+                        attr_len, attr_type = struct.unpack_from("=HH", data, attr)
+                        if attr_len < 4:
+                            break
+                        if attr_type in (ifa_local, ifa_address) and attr_len == 8:
+                            ip = data[attr + 4 : attr + 8]
+                            ips = addresses.setdefault(index, [])
+                            if ip[0] != 127:
+                                ips.append(ip)
+                        attr += (attr_len + 3) & ~3
+                offset += (msg_len + 3) & ~3
+
+
+def _ipv4_interfaces() -> list[str]:
+    """List interfaces that have a non-loopback IPv4 address, in interface order."""
+    if SYSTEM == "Linux":
+        try:
+            return _netlink_ipv4_interfaces()
+        except OSError as e:
+            logger.debug(f"Netlink address dump failed, falling back to netifaces: {e}")
+
+    import netifaces
+
+    interfaces = []
+    for interface in netifaces.interfaces():
+        addrs = netifaces.ifaddresses(interface).get(netifaces.AF_INET, [])
+        if any(addr.get("addr", "") and not addr["addr"].startswith("127.") for addr in addrs):
+            interfaces.append(interface)
+    return interfaces
+
+
+@lru_cache(maxsize=1)
+def _find_xray_on_path() -> str | None:
+    """Search PATH for xray once; try both "xray" and "xray.exe" for better Windows compatibility."""
+    return which("xray") or which("xray.exe")
+
+
+@lru_cache(maxsize=8)
+def _xray_version_info(xray_binary: str, mtime: int) -> dict:
+    """Run `xray version` and parse its output; mtime is only part of the cache key."""
+    # The output is a couple of lines, so capture it in one go with a bound on the wait
+    result = subprocess.run(
+        [xray_binary, "version"],
+        capture_output=True,
+        timeout=5,
+        check=False,
+        creationflags=CREATIONFLAGS,
+    )
+
+    if result.returncode == 0:
+        version_output = result.stdout.decode().strip()
+
+        # Usual case: one pass over the whole output finds the banner line with every field, e.g.
+        # Xray 1.8.4 (Xray, Penetrates Everything.) 2cba2c4 (go1.24.1 linux/amd64)
+        m = _XRAY_VERSION_RE.search(version_output)
+        if m:
+            return {
+                "available": True,
+                "version": m.group(1),
+                "commit": m.group(2),
+                "go_version": m.group(3),
+                "arch": m.group(4),
+            }
+
+        # Otherwise the format differs, so pick up whatever fields we can line by line
+        version_info = {
+            "available": True,
+            "version": None,
+            "commit": None,
+            "go_version": None,
+            "arch": None,
+        }
+
+        lines = version_output.split("\n")
+        for line in lines:
+            line = line.strip()
+            if "commit:" in line.lower():
+                version_info["commit"] = line.split(":", 1)[1].strip()
+            elif "go version" in line.lower():
+                # e.g. go version go1.24.1 linux/amd64
+                go_version_match = _GO_VERSION_RE.search(line)
+                if go_version_match:
+                    version_info["go_version"] = go_version_match.group(1)
+                arch_match = _ARCH_RE.search(line)
+                if arch_match:
+                    version_info["arch"] = arch_match.group(1)
+            elif "/" in line and any(arch in line for arch in ["amd64", "arm64", "386", "arm"]):
+                # Try to extract arch from e.g. linux/amd64
+                arch_match = _ARCH_RE.search(line)
+                if arch_match:
+                    version_info["arch"] = arch_match.group(1)
+
+        return version_info
+    return {"available": False, "error": result.stderr.decode().strip()}
+
+
+def _exited_within(process: subprocess.Popen, timeout: float) -> bool:
+    """Wait up to timeout seconds for process to exit, returning as soon as it does."""
+    if hasattr(os, "pidfd_open"):
+        try:
+            pidfd = os.pidfd_open(process.pid)
+        except OSError:
+            pass  # Already reaped, or the kernel has no pidfd support
+        else:
+            # A pidfd becomes readable when the process exits
+            try:
+                with selectors.DefaultSelector() as selector:
+                    selector.register(pidfd, selectors.EVENT_READ)
+                    selector.select(timeout)
+            finally:
+                os.close(pidfd)
+            return process.poll() is not None
+
+    deadline = time.monotonic() + timeout
+    while process.poll() is None:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+class LogBuffer:
+    """Recent log entries of one server, dropping the oldest once maxlen is reached.
+
+    A single reader thread appends and GUI calls pop; deque appends and pops
+    are atomic, so only waiting for new entries needs an Event. The same Event
+    is set on close, so readers wake up once the server's output has ended.
+    """
+
+    __slots__ = ("_closed", "_ended", "_entries", "_ready")
 
-class UUIDEncoder(json.JSONEncoder):
-    """Custom JSON encoder that handles UUID objects."""
+    def __init__(self, maxlen: int = 200) -> None:
+        self._entries: deque[dict] = deque(maxlen=maxlen)
+        self._ready = threading.Event()
+        self._ended = threading.Event()
+        self._closed = False
 
-    def default(self, obj):
-        if isinstance(obj, UUID):
-            return str(obj)
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super().default(obj)
+    @property
+    def closed(self) -> bool:
+        """Whether no more entries will be appended."""
+        return self._closed
+
+    def close(self) -> None:
+        """Mark the buffer as finished and wake up a waiting reader."""
+        self._closed = True
+        self._ended.set()
+        self._ready.set()
+
+    def wait_closed(self, timeout: float) -> bool:
+        """Wait up to timeout seconds for the buffer to be closed; return whether it is."""
+        return self._ended.wait(timeout)
+
+    def append(self, entry: dict) -> None:
+        """Add an entry and wake up a waiting reader."""
+        self._entries.append(entry)
+        self._ready.set()
+
+    def pop_nowait(self) -> dict | None:
+        """Remove and return the oldest entry, or None if there is none."""
+        try:
+            return self._entries.popleft()
+        except IndexError:
+            return None
+
+    def drain(self, limit: int) -> list[dict]:
+        """Remove and return up to limit of the oldest entries in one go."""
+        entries = []
+        popleft = self._entries.popleft
+        try:
+            for _ in range(min(limit, len(self._entries))):
+                entries.append(popleft())
+        except IndexError:
+            pass  # Another reader took the rest
+        return entries
+
+    def pop(self, timeout: float | None = None) -> dict | None:
+        """Remove and return the oldest entry, waiting up to timeout seconds for one."""
+        entry = self.pop_nowait()
+        if entry is None:
+            self._ready.clear()
+            # Check again, an entry or close may have arrived just before the clear
+            if not self._entries and not self._closed:
+                self._ready.wait(timeout)
+            entry = self.pop_nowait()
+        return entry
+
+
+def _json_default(obj):
+    """Serialize the UUID and datetime values json can't handle on its own."""
+    if isinstance(obj, UUID):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    msg = f"Object of type {type(obj).__name__} is not JSON serializable"
+    raise TypeError(msg)
 
 
 class ProcessManager:
     """Manages xray-core processes."""
 
     def __init__(self) -> None:
-        self.running_processes: dict[UUID, ProcessInfo] = {}
-        self.process_handles: dict[UUID, subprocess.Popen] = {}
-        self.log_queues: dict[UUID, Queue] = {}
-        self.log_threads: dict[UUID, threading.Thread] = {}
-        self.current_server_id: UUID | None = None  # Track the currently running server
+        self.running_processes: dict[str, ProcessInfo] = {}
+        self.process_handles: dict[str, subprocess.Popen] = {}
+        self.log_queues: dict[str, LogBuffer] = {}
+        self.log_threads: dict[str, threading.Thread] = {}  # Only used where pipes can't be selected
+        self._log_selector: selectors.BaseSelector | None = None
+        self._log_dispatcher: threading.Thread | None = None
+        self._log_dispatcher_lock = threading.Lock()
+        self.current_server_id: str | None = None  # Track the currently running server
+        self._lock = threading.RLock()  # Guards changes to the dicts above and current_server_id
+        self._default_iface_cache: tuple[float, str | None] | None = None
+        self._settings_cache: tuple[float, SettingsModel] | None = None
+        self._test_session: Session | None = None
+        # Servers started for connectivity tests: server_id -> (testers, socks_port, http_port)
+        self._test_servers: dict[str, tuple[int, int, int]] = {}
+
+    def _cached_settings(self) -> SettingsModel:
+        """Get the settings, reusing the last read for SETTINGS_CACHE_TTL seconds."""
+        cached = self._settings_cache
+        if cached and time.monotonic() - cached[0] < SETTINGS_CACHE_TTL:
+            return cached[1]
+
+        settings = db.get_settings()
+        self._settings_cache = (time.monotonic(), settings)
+        return settings
+
+    def invalidate_settings_cache(self) -> None:
+        """Forget the cached settings, e.g. after they were written."""
+        self._settings_cache = None
+        _xray_version_info.cache_clear()
 
     def get_effective_xray_binary(self) -> str:
         """Get the effective xray binary path from database settings or system PATH."""
         try:
-            db_settings = db.get_settings()
+            db_settings = self._cached_settings()
             if db_settings.xray_binary:
                 return db_settings.xray_binary
         except Exception as e:
             logger.warning(f"Failed to get xray_binary from database settings: {e}")
 
-        # Try both "xray" and "xray.exe" for better Windows compatibility
-        xray_path = which("xray") or which("xray.exe")
+        xray_path = _find_xray_on_path()
         if xray_path:
             return xray_path
 
-        if platform.system() == "Linux":
-            return "/usr/bin/xray"
-        if platform.system() == "Windows":
+        if SYSTEM == "Windows":
             return "C:\\Program Files\\Xray\\xray.exe"
         return "/usr/bin/xray"
 
     def get_xray_assets_folder(self) -> str | None:
         """Get the xray assets folder from database settings."""
         try:
-            db_settings = db.get_settings()
+            db_settings = self._cached_settings()
             if db_settings.xray_assets_folder:
                 return db_settings.xray_assets_folder
         except Exception as e:
@@ -83,8 +387,24 @@ class ProcessManager:
         return None
 
     def get_default_network_interface(self) -> str | None:
-        """Get the default network interface for the current system."""
+        """Get the default network interface, reusing the last result for NETWORK_CACHE_TTL seconds."""
+        cached = self._default_iface_cache
+        if cached and time.monotonic() - cached[0] < NETWORK_CACHE_TTL:
+            return cached[1]
+
+        interface = self._detect_default_network_interface()
+        self._default_iface_cache = (time.monotonic(), interface)
+        return interface
+
+    def invalidate_network_cache(self) -> None:
+        """Forget the cached default network interface."""
+        self._default_iface_cache = None
+
+    def _detect_default_network_interface(self) -> str | None:
+        """Detect the default network interface for the current system."""
         try:
+            import netifaces
+
             # Get the interface associated with the default gateway
             default_gateway = netifaces.gateways().get("default", {})
             if default_gateway:
@@ -96,19 +416,11 @@ class ProcessManager:
                         return interface
 
             # Fallback: find the first non-loopback interface with an IP
-            interfaces = netifaces.interfaces()
-            for interface in interfaces:
+            for interface in _ipv4_interfaces():
                 if interface.startswith("lo"):
                     continue  # Skip loopback interfaces
-
-                addr_info = netifaces.ifaddresses(interface)
-                if netifaces.AF_INET in addr_info:
-                    addrs = addr_info[netifaces.AF_INET]
-                    for addr in addrs:
-                        ip = addr.get("addr", "")
-                        if ip and not ip.startswith("127."):  # Not loopback
-                            logger.info(f"Fallback: Using network interface: {interface}")
-                            return interface
+                logger.info(f"Fallback: Using network interface: {interface}")
+                return interface
 
         except Exception as e:
             logger.warning(f"Failed to detect default network interface: {e}")
@@ -120,82 +432,14 @@ class ProcessManager:
     def check_xray_availability(self) -> dict[str, any]:
         """Check if xray-core is available and get version info."""
         try:
-            # Try to run xray version command
             xray_binary = self.get_effective_xray_binary()
-
-            # On Windows, hide the console window
-            creationflags = 0
-            if platform.system() == "Windows":
-                creationflags = subprocess.CREATE_NO_WINDOW
-
-            process = subprocess.Popen(
-                [xray_binary, "version"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                creationflags=creationflags,
-            )
-
-            stdout, stderr = process.communicate()
-
-            if process.returncode == 0:
-                version_output = stdout.decode().strip()
-
-                # Parse version information
-                version_info = {
-                    "available": True,
-                    "version": None,
-                    "commit": None,
-                    "go_version": None,
-                    "arch": None,
-                }
-
-                # Parse version string (format may vary)
-                # Example output:
-                # Xray 1.8.4 (Xray, Penetrates Everything.) Custom (go1.21.1 linux/amd64)
-                # A more robust parser:
-                import re
-
-                lines = version_output.split("\n")
-                for line in lines:
-                    line = line.strip()
-                    # Match version line: Xray 1.8.4 (Xray, Penetrates Everything.) 2cba2c4 (go1.24.1 linux/amd64)
-                    m = re.match(
-                        r"^Xray\s+([0-9]+\.[0-9]+\.[0-9]+)[^\n]*?(?:\s+([0-9a-f]{7,}))?\s*\((go[0-9.]+)\s+([^\s)]+)\)",
-                        line,
-                    )
-                    if m:
-                        version_info["version"] = m.group(1)
-                        if m.group(2):
-                            version_info["commit"] = m.group(2)
-                        version_info["go_version"] = m.group(3)
-                        version_info["arch"] = m.group(4)
-                        continue
-
-                    # Fallbacks for other lines
-                    if "commit:" in line.lower():
-                        version_info["commit"] = line.split(":", 1)[1].strip()
-                    elif "go version" in line.lower():
-                        # e.g. go version go1.24.1 linux/amd64
-                        go_version_match = re.search(
-                            r"go version ([^\s]+)",
-                            line,
-                            re.IGNORECASE,
-                        )
-                        if go_version_match:
-                            version_info["go_version"] = go_version_match.group(1)
-                        arch_match = re.search(r"(amd64|arm64|386|arm)", line)
-                        if arch_match:
-                            version_info["arch"] = arch_match.group(1)
-                    elif "/" in line and any(arch in line for arch in ["amd64", "arm64", "386", "arm"]):
-                        # Try to extract arch from e.g. linux/amd64
-                        arch_match = re.search(r"(amd64|arm64|386|arm)", line)
-                        if arch_match:
-                            version_info["arch"] = arch_match.group(1)
-
-                return version_info
-            return {"available": False, "error": stderr.decode().strip()}
+            # The output only changes with the binary, so reuse it until the file is replaced
+            mtime = os.stat(which(xray_binary) or xray_binary).st_mtime_ns
+            return dict(_xray_version_info(xray_binary, mtime))
 
         except FileNotFoundError:
+            # xray may have been installed since the PATH was searched
+            _find_xray_on_path.cache_clear()
             xray_binary = self.get_effective_xray_binary()
             return {
                 "available": False,
@@ -206,8 +450,8 @@ class ProcessManager:
 
     def start_single_server(
         self,
-        server_id: UUID,
-        subscription_id: UUID,
+        server_id: str,
+        subscription_id: str,
         config: dict,
         socks_port: int | None = None,
         http_port: int | None = None,
@@ -219,11 +463,12 @@ class ProcessManager:
 
         """
         # Stop any currently running server first
-        if self.current_server_id and self.is_server_running(self.current_server_id):
+        current_server_id = self.current_server_id
+        if current_server_id and self.is_server_running(current_server_id):
             logger.info(
-                f"Stopping current server {self.current_server_id} before starting new one",
+                f"Stopping current server {current_server_id} before starting new one",
             )
-            self.stop_server(self.current_server_id)
+            self.stop_server(current_server_id)
 
         # Start the new server with port overrides
         success, error_msg = self.start_server(
@@ -234,123 +479,128 @@ class ProcessManager:
             http_port,
         )
         if success:
-            self.current_server_id = server_id
+            with self._lock:
+                self.current_server_id = server_id
 
         return success, error_msg
 
-    def _apply_port_overrides(
+    def _prepare_runtime_config(
         self,
         config: dict,
         socks_port: int | None,
         http_port: int | None,
     ) -> dict:
-        """Apply global port overrides to inbound configurations at runtime."""
+        """Apply the runtime overrides (not stored in database) to a server config in one pass.
+
+        Only the top-level dict and the parts that change are copied, the given config is left untouched.
+        """
+        runtime_config = dict(config)
+        self._apply_port_overrides(runtime_config, socks_port, http_port)
+        self._apply_log_level_override(runtime_config)
+        self._apply_default_network_interface(runtime_config)
+        return runtime_config
+
+    def _apply_port_overrides(
+        self,
+        config: dict,
+        socks_port: int | None,
+        http_port: int | None,
+    ) -> None:
+        """Apply global port overrides to inbound configurations, in place on a top-level copy."""
         if not config.get("inbounds") or (not socks_port and not http_port):
-            return config
-        modified_config = deepcopy(config)
+            return
+        inbounds = list(config["inbounds"])
 
-        for inbound in modified_config.get("inbounds", []):
+        for i, inbound in enumerate(inbounds):
             tag = inbound.get("tag", "").lower()
 
             if socks_port and "socks" in tag:
-                original_port = inbound.get("port")
-                inbound["port"] = socks_port
-                logger.info(f"Overriding SOCKS port: {original_port} -> {socks_port}")
+                inbounds[i] = {**inbound, "port": socks_port}
+                logger.info(f"Overriding SOCKS port: {inbound.get('port')} -> {socks_port}")
             elif http_port and "http" in tag:
-                original_port = inbound.get("port")
-                inbound["port"] = http_port
-                logger.info(f"Overriding HTTP port: {original_port} -> {http_port}")
+                inbounds[i] = {**inbound, "port": http_port}
+                logger.info(f"Overriding HTTP port: {inbound.get('port')} -> {http_port}")
 
-        return modified_config
+        config["inbounds"] = inbounds
 
-    def _apply_log_level_override(self, config: dict) -> dict:
-        """Apply global log level override to xray configuration."""
+    def _apply_log_level_override(self, config: dict) -> None:
+        """Apply global log level override to xray configuration, in place on a top-level copy."""
         try:
-            db_settings = db.get_settings()
+            db_settings = self._cached_settings()
             if db_settings.xray_log_level:
-                modified_config = deepcopy(config)
-
-                # Ensure log section exists
-                if "log" not in modified_config:
-                    modified_config["log"] = {}
+                log = _cow(config, "log")
 
                 # Override the log level
-                original_level = modified_config["log"].get("loglevel", "warning")
-                modified_config["log"]["loglevel"] = db_settings.xray_log_level
+                original_level = log.get("loglevel", "warning")
+                log["loglevel"] = db_settings.xray_log_level
 
                 logger.info(
                     f"Overriding xray log level: {original_level} -> {db_settings.xray_log_level}",
                 )
-                return modified_config
         except Exception as e:
             logger.warning(f"Failed to apply log level override: {e}")
 
-        return config
-
-    def _apply_default_network_interface(self, config: dict) -> dict:
+    def _apply_default_network_interface(self, config: dict) -> None:
         """Apply default network interface to outbound configurations that don't have streamSettings.sockopt.interface defined."""
         try:
             default_interface = self.get_default_network_interface()
             if not default_interface:
                 logger.debug("No default network interface available, skipping interface injection")
-                return config
+                return
 
-            modified_config = deepcopy(config)
-            outbounds = modified_config.get("outbounds", [])
-
-            if not outbounds:
-                return modified_config
+            if not config.get("outbounds"):
+                return
 
+            outbounds = list(config["outbounds"])
             interface_added_count = 0
 
-            for outbound in outbounds:
+            for i, outbound in enumerate(outbounds):
                 # Skip if outbound already has sockopt.interface defined
-                stream_settings = outbound.get("streamSettings", {})
-                sockopt = stream_settings.get("sockopt", {})
+                stream_settings = outbound.get("streamSettings")
+                sockopt = stream_settings.get("sockopt") if stream_settings else None
 
-                if "interface" in sockopt:
+                if sockopt and "interface" in sockopt:
                     logger.debug(
                         f"Outbound {outbound.get('tag', '-')} already has interface defined: {sockopt.get('interface')}"
                     )
                     continue
 
-                # Add default interface to this outbound
-                if "streamSettings" not in outbound:
-                    outbound["streamSettings"] = {}
-                if "sockopt" not in outbound["streamSettings"]:
-                    outbound["streamSettings"]["sockopt"] = {}
-
-                outbound["streamSettings"]["sockopt"]["interface"] = default_interface
+                # Walk down to xhttp downloadSettings without building empty dicts for missing levels
+                download_settings = None
+                if stream_settings:
+                    xhttp_settings = stream_settings.get("xhttpSettings")
+                    extra = xhttp_settings.get("extra") if xhttp_settings else None
+                    download_settings = extra.get("downloadSettings") if extra else None
 
-                download_settings = (
-                    stream_settings.get("xhttpSettings", {}).get("extra", {}).get("downloadSettings", {})
-                )
+                # Add default interface to a copy of this outbound
+                outbound = outbounds[i] = dict(outbound)
+                stream_settings = _cow(outbound, "streamSettings")
+                _cow(stream_settings, "sockopt")["interface"] = default_interface
 
                 if download_settings:
-                    if "sockopt" not in download_settings:
-                        download_settings["sockopt"] = {}
-                    if "interface" not in download_settings["sockopt"]:
-                        download_settings["sockopt"]["interface"] = default_interface
+                    download_sockopt = download_settings.get("sockopt")
+                    if not download_sockopt or "interface" not in download_sockopt:
+                        extra = _cow(_cow(stream_settings, "xhttpSettings"), "extra")
+                        _cow(_cow(extra, "downloadSettings"), "sockopt")["interface"] = default_interface
 
                 interface_added_count += 1
 
                 logger.debug(f"Added default interface '{default_interface}' to outbound {outbound.get('tag', '-')}")
 
+            config["outbounds"] = outbounds
+
             if interface_added_count > 0:
                 logger.info(
                     f"Applied default network interface '{default_interface}' to {interface_added_count} outbound(s)"
                 )
 
-            return modified_config
-
         except Exception as e:
             logger.warning(f"Failed to apply default network interface: {e}")
-            return config
 
     def start_server(
         self,
-        server_id: UUID,
-        subscription_id: UUID,
+        server_id: str,
+        subscription_id: str,
         config: dict,
         socks_port: int | None = None,
         http_port: int | None = None,
@@ -361,22 +611,18 @@ class ProcessManager:
             Tuple[bool, Optional[str]]: (success, error_message)
 
         """
-        if server_id in self.running_processes:
-            logger.warning(f"Server {server_id} is already running")
-            return False, None
+        with self._lock:
+            if server_id in self.running_processes:
+                logger.warning(f"Server {server_id} is already running")
+                return False, None
 
         try:
-            # Apply port overrides at runtime (not stored in database)
-            runtime_config = self._apply_port_overrides(config, socks_port, http_port)
+            # Apply port, log level and network interface overrides at runtime
+            runtime_config = self._prepare_runtime_config(config, socks_port, http_port)
 
-            # Apply log level override at runtime (not stored in database)
-            runtime_config = self._apply_log_level_override(runtime_config)
-
-            # Apply default network interface to outbounds at runtime (not stored in database)
-            runtime_config = self._apply_default_network_interface(runtime_config)
-
-            # Convert config to JSON string with UUID support
-            config_json = json.dumps(runtime_config, indent=2, cls=UUIDEncoder)
+            # Serialize the config with UUID support; xray doesn't need it indented, and the
+            # intermediate str is dropped as soon as it's encoded
+            config_json = json.dumps(runtime_config, default=_json_default).encode()
             logger.debug(
                 f"Starting server {server_id} with config size: {len(config_json)} bytes",
             )
@@ -388,29 +634,24 @@ class ProcessManager:
             # Prepare environment variables
             env = None
             if xray_assets_folder:
-                env = os.environ.copy()
-                env["XRAY_LOCATION_ASSET"] = xray_assets_folder
+                env = {**os.environ, "XRAY_LOCATION_ASSET": xray_assets_folder}
                 logger.info(
                     f"Setting XRAY_LOCATION_ASSET environment variable to: {xray_assets_folder}",
                 )
 
             # Create subprocess
-            # On Windows, hide the console window
-            creationflags = 0
-            if platform.system() == "Windows":
-                creationflags = subprocess.CREATE_NO_WINDOW
-
             process = subprocess.Popen(
                 [xray_binary, "run", "-config", "stdin:"],
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
+                bufsize=LOG_READ_SIZE,
                 env=env,
-                creationflags=creationflags,
+                creationflags=CREATIONFLAGS,
             )
 
             # Send config via stdin
-            process.stdin.write(config_json.encode())
+            process.stdin.write(config_json)
             process.stdin.close()
 
             # Store process information with runtime config (including port overrides)
@@ -422,53 +663,56 @@ class ProcessManager:
                 config=runtime_config,  # Store the config with applied overrides
             )
 
-            self.running_processes[server_id] = process_info
-            self.process_handles[server_id] = process
-
             # Create log queue for this server with limited size
-            self.log_queues[server_id] = Queue(maxsize=200)
-
-            # Start log reading thread
-            log_thread = threading.Thread(
-                target=self._read_process_logs,
-                args=(server_id, process),
-                daemon=True,
-            )
-            log_thread.start()
-            self.log_threads[server_id] = log_thread
+            buffer = LogBuffer(maxlen=LOG_BUFFER_SIZE)
+
+            with self._lock:
+                self.running_processes[server_id] = process_info
+                self.process_handles[server_id] = process
+                self.log_queues[server_id] = buffer
+
+                # Start reading logs, from the shared dispatcher where pipes can be selected
+                if SYSTEM == "Windows":
+                    log_thread = threading.Thread(
+                        target=self._read_process_logs,
+                        args=(server_id, process, buffer),
+                        daemon=True,
+                    )
+                    log_thread.start()
+                    self.log_threads[server_id] = log_thread
+                else:
+                    self._register_log_pipe(server_id, process, buffer)
 
             # Give the process a moment to start and check if it's still running
-            time.sleep(0.1)
-
-            if process.poll() is not None:
+            if _exited_within(process, STARTUP_PROBE_TIME):
                 # Process died immediately, clean up and return failure
                 logger.error(
                     f"Server {server_id} process died immediately with return code {process.returncode}",
                 )
 
-                # Try to read any error output
+                # The log reader has likely moved xray's error into the buffer already, so let it
+                # reach the end of the output and take the error from there
                 error_details = f"Process exited with code {process.returncode}"
-                try:
-                    remaining_output = process.stdout.read()
-                    if remaining_output:
-                        error_msg = remaining_output.decode(
-                            "utf-8",
-                            errors="ignore",
-                        ).strip()
-                        logger.error(f"Server {server_id} error output: {error_msg}")
-                        error_details = f"Process exited with code {process.returncode}. Error: {error_msg}"
-                except Exception as ex:
-                    logger.debug(f"Failed to read error output: {ex}")
+                closed = buffer.wait_closed(EXIT_OUTPUT_TIMEOUT)
+                self._unregister_log_pipe(process.stdout)
+                output = [entry["message"] for entry in buffer.drain(LOG_BUFFER_SIZE)]
+                if not closed and SYSTEM != "Windows":
+                    # Something still holds the pipe open, take what it has buffered (the
+                    # Windows reader thread keeps reading it, so it's left alone there)
+                    try:
+                        remaining_output = process.stdout.read()
+                        if remaining_output:
+                            output.append(remaining_output.decode("utf-8", errors="ignore").strip())
+                    except Exception as ex:
+                        logger.debug(f"Failed to read error output: {ex}")
+
+                error_msg = "\n".join(line for line in output if line)
+                if error_msg:
+                    logger.error(f"Server {server_id} error output: {error_msg}")
+                    error_details = f"Process exited with code {process.returncode}. Error: {error_msg}"
 
                 # Clean up
-                if server_id in self.running_processes:
-                    del self.running_processes[server_id]
-                if server_id in self.process_handles:
-                    del self.process_handles[server_id]
-                if server_id in self.log_queues:
-                    del self.log_queues[server_id]
-                if server_id in self.log_threads:
-                    del self.log_threads[server_id]
+                self._cleanup_server_state(server_id)
                 return False, error_details
 
             logger.info(f"Started server {server_id} with PID {process.pid}")
@@ -479,27 +723,19 @@ class ProcessManager:
             logger.exception(f"Failed to start server {server_id}: {error_msg}")
 
             # Clean up on exception
-            if server_id in self.running_processes:
-                del self.running_processes[server_id]
-
-            if server_id in self.process_handles:
-                del self.process_handles[server_id]
-            if server_id in self.log_queues:
-                del self.log_queues[server_id]
-            if server_id in self.log_threads:
-                del self.log_threads[server_id]
+            self._cleanup_server_state(server_id)
 
             return False, f"Failed to start server: {error_msg}"
 
-    def stop_server(self, server_id: UUID) -> bool:
+    def stop_server(self, server_id: str) -> bool:
         """Stop a running server."""
-        if server_id not in self.running_processes:
-            logger.warning(f"Server {server_id} is not running")
-            return False
+        with self._lock:
+            process = self.process_handles.get(server_id)
+            if server_id not in self.running_processes or process is None:
+                logger.warning(f"Server {server_id} is not running")
+                return False
 
         try:
-            process = self.process_handles[server_id]
-
             # Try graceful termination first
             process.terminate()
 
@@ -511,19 +747,14 @@ class ProcessManager:
                 process.kill()
                 process.wait()
 
-            # Clean up
-            del self.running_processes[server_id]
-            del self.process_handles[server_id]
-
-            # Clean up log queue and thread
-            if server_id in self.log_queues:
-                del self.log_queues[server_id]
-            if server_id in self.log_threads:
-                del self.log_threads[server_id]
+            with self._lock:
+                # Clean up process, log queue and thread, unless a new process took its place meanwhile
+                if self.process_handles.get(server_id) is process:
+                    self._cleanup_server_state(server_id)
 
-            # Clear current server if this was it
-            if self.current_server_id == server_id:
-                self.current_server_id = None
+                # Clear current server if this was it
+                if self.current_server_id == server_id:
+                    self.current_server_id = None
 
             logger.info(f"Stopped server {server_id}")
             return True
@@ -532,10 +763,23 @@ class ProcessManager:
             logger.exception(f"Failed to stop server {server_id}: {e}")
             return False
 
+    def _cleanup_server_state(self, server_id: str) -> None:
+        """Forget everything kept for a server and stop reading its logs."""
+        with self._lock:
+            self.running_processes.pop(server_id, None)
+            process = self.process_handles.pop(server_id, None)
+            buffer = self.log_queues.pop(server_id, None)
+            self.log_threads.pop(server_id, None)
+
+        if process is not None:
+            self._unregister_log_pipe(process.stdout)
+        if buffer is not None:
+            buffer.close()
+
     def restart_server(
         self,
-        server_id: UUID,
-        subscription_id: UUID,
+        server_id: str,
+        subscription_id: str,
         config: dict,
         socks_port: int | None = None,
         http_port: int | None = None,
@@ -559,7 +803,7 @@ class ProcessManager:
             http_port,
         )
 
-    def is_server_running(self, server_id: UUID) -> bool:
+    def is_server_running(self, server_id: str) -> bool:
         """Check if a server is currently running."""
         if server_id not in self.running_processes:
             return False
@@ -571,28 +815,21 @@ class ProcessManager:
         # Check if process is still alive
         if process.poll() is not None:
             # Process has terminated, clean up
-            if server_id in self.running_processes:
-                del self.running_processes[server_id]
-            if server_id in self.process_handles:
-                del self.process_handles[server_id]
-            if server_id in self.log_queues:
-                del self.log_queues[server_id]
-            if server_id in self.log_threads:
-                del self.log_threads[server_id]
+            self._cleanup_server_state(server_id)
             return False
 
         return True
 
-    def get_process_info(self, server_id: UUID) -> ProcessInfo | None:
+    def get_process_info(self, server_id: str) -> ProcessInfo | None:
         """Get process information for a server."""
         return self.running_processes.get(server_id)
 
-    def get_server_ports(self, server_id: UUID) -> list[int]:
+    def get_server_ports(self, server_id: str) -> list[int]:
         """Get the allocated ports for a server (legacy method for backward compatibility)."""
         port_info = self.get_server_port_info(server_id)
         return [port["port"] for port in port_info]
 
-    def get_server_port_info(self, server_id: UUID) -> list[dict[str, any]]:
+    def get_server_port_info(self, server_id: str) -> list[dict[str, any]]:
         """Get detailed port information including protocols for a server."""
         if server_id not in self.running_processes:
             return []
@@ -626,7 +863,7 @@ class ProcessManager:
         return "unknown"
 
     # Single server convenience methods
-    def get_current_server_id(self) -> UUID | None:
+    def get_current_server_id(self) -> str | None:
         """Get the currently running server ID."""
         return self.current_server_id
 
@@ -662,7 +899,7 @@ class ProcessManager:
 
     def restart_current_server(
         self,
-        subscription_id: UUID,
+        subscription_id: str,
         config: dict,
         socks_port: int | None = None,
         http_port: int | None = None,
@@ -683,61 +920,164 @@ class ProcessManager:
             )
         return False, "No server is currently running"
 
-    def _read_process_logs(self, server_id: UUID, process: subprocess.Popen) -> None:
+    def restart_current(
+        self,
+        socks_port: int | None = None,
+        http_port: int | None = None,
+    ) -> bool:
+        """Restart the currently running server with its config, optionally on new ports.
+
+        Returns:
+            bool: True if a server was running and came back up
+
+        """
+        with self._lock:
+            server_id = self.current_server_id
+            if not server_id or not self.is_server_running(server_id):
+                return False
+            server_info = self.running_processes.get(server_id)
+            if not server_info:
+                return False
+
+        self.stop_server(server_id)
+        ok, _err = self.start_single_server(
+            server_info.server_id,
+            server_info.subscription_id,
+            server_info.config,
+            socks_port,
+            http_port,
+        )
+        return ok
+
+    def _queue_log_line(self, server_id: str, buffer: LogBuffer, line_bytes: bytes) -> None:
+        """Decode a raw log line and queue it for the GUI."""
+        line = line_bytes.decode("utf-8", errors="ignore").strip()
+        if not line:
+            return
+
+        # Queue the log line; a full buffer drops its oldest entry.
+        # Only the raw clock is read here, the timestamp is formatted when the entry is handed out.
+        buffer.append(
+            {
+                "time_ns": time.time_ns(),
+                "server_id": server_id,
+                "message": line,
+            },
+        )
+
+    def _read_process_logs(self, server_id: str, process: subprocess.Popen, buffer: LogBuffer) -> None:
         """Read logs from a process and queue them."""
+        fd = process.stdout.fileno()
+        pending = bytearray()
         try:
             while True:
-                # Use readline to avoid blocking
-                line_bytes = process.stdout.readline()
-                if not line_bytes:
+                # Take whatever is in the pipe, up to LOG_READ_SIZE, instead of a line at a time
+                chunk = os.read(fd, LOG_READ_SIZE)
+                if not chunk:
                     break
+                pending += chunk
+                *lines, rest = pending.split(b"\n")
+                pending[:] = rest
+                for line_bytes in lines:
+                    self._queue_log_line(server_id, buffer, line_bytes)
 
-                line = line_bytes.decode("utf-8", errors="ignore").strip()
-                if not line:
-                    continue
-
-                # Queue the log line
-                if server_id in self.log_queues:
-                    try:
-                        self.log_queues[server_id].put(
-                            {
-                                "timestamp": datetime.now(),
-                                "server_id": server_id,
-                                "message": line,
-                            },
-                            block=False,
-                        )
-                    except Exception:
-                        # Queue is full or other error, skip this log entry
-                        pass
+            if pending:
+                self._queue_log_line(server_id, buffer, bytes(pending))
 
         except Exception as e:
             logger.exception(f"Error reading logs for server {server_id}: {e}")
         finally:
+            buffer.close()
             logger.debug(f"Log reading thread for server {server_id} ended")
 
-    def get_server_logs(self, server_id: UUID) -> Generator[dict]:
+    def _register_log_pipe(self, server_id: str, process: subprocess.Popen, buffer: LogBuffer) -> None:
+        """Hand a process's output pipe to the shared log dispatcher thread."""
+        os.set_blocking(process.stdout.fileno(), False)
+        with self._log_dispatcher_lock:
+            if self._log_selector is None:
+                self._log_selector = selectors.DefaultSelector()
+            self._log_selector.register(process.stdout, selectors.EVENT_READ, (server_id, buffer, bytearray()))
+
+            if self._log_dispatcher is None:
+                self._log_dispatcher = threading.Thread(
+                    target=self._dispatch_logs,
+                    name="nabzram-logs",
+                    daemon=True,
+                )
+                self._log_dispatcher.start()
+
+    def _dispatch_logs(self) -> None:
+        """Read the output of every running process from one thread, exiting once none are left."""
+        selector = self._log_selector
+        while True:
+            with self._log_dispatcher_lock:
+                if not selector.get_map():
+                    self._log_dispatcher = None
+                    return
+
+            for key, _events in selector.select(timeout=1.0):
+                server_id, buffer, pending = key.data
+                eof = False
+                # Drain the pipe before going back to select(), so a burst of output costs one wake-up
+                while True:
+                    try:
+                        # Read the raw fd, the pipe's BufferedReader would only add a copy and a lock
+                        chunk = os.read(key.fd, LOG_READ_SIZE)
+                    except BlockingIOError:
+                        break  # Nothing more to read for now
+                    except Exception:
+                        logger.exception("Error reading logs for server %s", server_id)
+                        chunk = b""
+
+                    if not chunk:
+                        eof = True
+                        break
+                    pending += chunk
+                    if len(chunk) < LOG_READ_SIZE:
+                        break  # Short read, the pipe is empty
+
+                *lines, rest = pending.split(b"\n")
+                pending[:] = rest
+                for line_bytes in lines:
+                    self._queue_log_line(server_id, buffer, line_bytes)
+
+                if eof:
+                    # The process exited, flush whatever is left of the last line
+                    if pending:
+                        self._queue_log_line(server_id, buffer, bytes(pending))
+                    self._unregister_log_pipe(key.fileobj)
+                    buffer.close()
+                    logger.debug(f"Log reading for server {server_id} ended")
+
+    def _unregister_log_pipe(self, pipe) -> None:
+        """Stop dispatching logs from a pipe, if it is still registered."""
+        with self._log_dispatcher_lock:
+            if self._log_selector is not None:
+                try:
+                    self._log_selector.unregister(pipe)
+                except (KeyError, ValueError):
+                    pass
+
+    def get_server_logs(self, server_id: str) -> Generator[LogEntry]:
         """Get real-time logs for a specific server."""
         if server_id not in self.log_queues:
             return
 
-        queue = self.log_queues[server_id]
+        buffer = self.log_queues[server_id]
 
         try:
             while True:
-                # Wait for log message with timeout
-                try:
-                    log_entry = queue.get(timeout=1.0)
-                    yield log_entry
-                except Empty:
-                    # Check if server is still running
-                    if not self.is_server_running(server_id):
-                        break
-                    continue
+                # Sleep until the reader appends an entry or closes the buffer at EOF/stop
+                log_entry = buffer.pop(timeout=LOG_IDLE_TIMEOUT)
+                if log_entry is not None:
+                    yield _format_log_entry(log_entry)
+                # The timeout is only a safety net in case a close was missed
+                elif buffer.closed or not self.is_server_running(server_id):
+                    break
         except Exception as e:
             logger.exception(f"Error streaming logs for server {server_id}: {e}")
 
-    def get_current_server_logs(self) -> Generator[dict]:
+    def get_current_server_logs(self) -> Generator[LogEntry]:
         """Get real-time logs from the currently running server."""
         if self.current_server_id:
             for log_entry in self.get_server_logs(self.current_server_id):
@@ -751,58 +1091,35 @@ class ProcessManager:
                         yield log_entry
                     break
 
-    def get_log_snapshot(self, server_id: UUID, limit: int = 100) -> list[dict]:
+    def get_log_snapshot(self, server_id: str, limit: int = 100) -> list[LogEntry]:
         """Get a snapshot of recent logs from the queue."""
         if server_id not in self.log_queues:
             return []
 
-        logs = []
-        queue = self.log_queues[server_id]
-
-        # Get all available logs from queue (non-blocking)
-        while len(logs) < limit:
-            try:
-                log_entry = queue.get_nowait()
-                logs.append(
-                    {
-                        "timestamp": log_entry["timestamp"].isoformat(),
-                        "message": log_entry["message"],
-                    },
-                )
-            except Empty:
-                break
-
-        return logs
+        # Take everything available from the buffer at once (non-blocking)
+        return [_format_log_entry(log_entry) for log_entry in self.log_queues[server_id].drain(limit)]
 
     def get_logs_since(
         self,
-        server_id: UUID,
+        server_id: str,
         since_ms: int,
         limit: int = 200,
-    ) -> list[dict]:
+    ) -> list[LogEntry]:
         """Get logs since a timestamp from the queue."""
         if server_id not in self.log_queues:
             return []
 
         logs = []
-        queue = self.log_queues[server_id]
+        buffer = self.log_queues[server_id]
+        # First nanosecond after since_ms, so entries compare without converting each one
+        since_ns = (since_ms + 1) * 1_000_000
 
-        # Get all available logs from queue (non-blocking)
+        # Get all available logs from the buffer in batches (non-blocking)
         while len(logs) < limit:
-            try:
-                log_entry = queue.get_nowait()
-                log_timestamp_ms = int(log_entry["timestamp"].timestamp() * 1000)
-
-                # Filter by timestamp
-                if log_timestamp_ms > since_ms:
-                    logs.append(
-                        {
-                            "timestamp": log_entry["timestamp"].isoformat(),
-                            "message": log_entry["message"],
-                        },
-                    )
-            except Empty:
+            batch = buffer.drain(limit - len(logs))
+            if not batch:
                 break
+            logs.extend(_format_log_entry(log_entry) for log_entry in batch if log_entry["time_ns"] >= since_ns)
 
         return logs
 
@@ -835,43 +1152,67 @@ class ProcessManager:
 
     def _wait_for_port(self, port: int, timeout: float = 5.0) -> bool:
         """Wait until the given port is open (listening) on localhost, or timeout."""
-        start = time.time()
-        while time.time() - start < timeout:
-            try:
-                with socket(AF_INET, SOCK_STREAM) as sock:
-                    sock.settimeout(0.2)
-                    sock.connect(("127.0.0.1", port))
+        deadline = time.monotonic() + timeout
+        delay = 0.005
+        while (remaining := deadline - time.monotonic()) > 0:
+            with socket(AF_INET, SOCK_STREAM) as sock:
+                sock.setblocking(False)
+                err = sock.connect_ex(("127.0.0.1", port))
+                if err in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+                    # Wait for the connect to finish; Windows reports a refused one as exceptional
+                    _, writable, failed = select.select([], [sock], [sock], remaining)
+                    err = sock.getsockopt(SOL_SOCKET, SO_ERROR) if writable or failed else errno.ETIMEDOUT
+                if err == 0:
                     return True
-            except Exception:
-                time.sleep(0.05)
+
+            # Nothing is listening yet, back off from 5ms up to 80ms between attempts
+            time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+            delay = min(delay * 2, 0.08)
         return False
 
     def _allocate_random_ports(self) -> tuple[int, int]:
         """Allocate random available ports for SOCKS and HTTP."""
-        # Find random starting points to avoid conflicts
-        socks_start = randint(10800, 20000)
-        http_start = randint(20001, 30000)
-
-        socks_port = self._find_available_port(socks_start)
-        http_port = self._find_available_port(http_start)
-
-        # Ensure ports are different
-        while http_port == socks_port:
-            http_port = self._find_available_port(http_port + 1)
-
-        return socks_port, http_port
+        # Let the kernel pick free ephemeral ports; both sockets stay bound until
+        # the ports are read, so the two are always different
+        with socket(AF_INET, SOCK_STREAM) as socks_sock, socket(AF_INET, SOCK_STREAM) as http_sock:
+            socks_sock.bind(("127.0.0.1", 0))
+            http_sock.bind(("127.0.0.1", 0))
+            return socks_sock.getsockname()[1], http_sock.getsockname()[1]
+
+    def _get_test_session(self) -> "Session":
+        """Get the HTTP session shared by connectivity tests, creating it on first use."""
+        if self._test_session is None:
+            with self._lock:
+                if self._test_session is None:
+                    from requests import Session
+                    from requests.adapters import HTTPAdapter
+
+                    # Keep one pool per test proxy so the requests of a test share a connection
+                    adapter = HTTPAdapter(
+                        pool_connections=CONNECTIVITY_TEST_WORKERS,
+                        pool_maxsize=CONNECTIVITY_TEST_WORKERS,
+                    )
+                    session = Session()
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._test_session = session
+        return self._test_session
 
     def test_server_connectivity(
         self,
-        server_id: UUID,
-        subscription_id: UUID,
+        server_id: str,
+        subscription_id: str,
         config: dict,
         test_timeout: int = 6,
     ) -> tuple[bool, int | None, str | None, int, int]:
         """Test server connectivity by starting it on random ports and making HTTP request
         Returns: (success, ping_ms, error_message, socks_port, http_port).
         """
+        from requests.exceptions import RequestException, Timeout
+
+        session = self._get_test_session()
         socks_port, http_port = self._allocate_random_ports()
+        joined = False
 
         try:
             if server_id == self.current_server_id:
@@ -883,56 +1224,57 @@ class ProcessManager:
                         http_port = p["port"]
 
             else:
-                # Start server with random ports
-                success, error_msg = self.start_server(
-                    server_id,
-                    subscription_id,
-                    config,
-                    socks_port,
-                    http_port,
-                )
-                if not success:
-                    error_detail = error_msg or "Failed to start server"
-                    return False, None, error_detail, socks_port, http_port
+                # Share the test server if another test of this server already started it
+                starter, socks_port, http_port = self._join_test_server(server_id, socks_port, http_port)
+                joined = True
+
+                if starter:
+                    # Start server with random ports
+                    success, error_msg = self.start_server(
+                        server_id,
+                        subscription_id,
+                        config,
+                        socks_port,
+                        http_port,
+                    )
+                    if not success:
+                        error_detail = error_msg or "Failed to start server"
+                        return False, None, error_detail, socks_port, http_port
 
                 # Wait a moment for server to fully start
                 self._wait_for_port(http_port, timeout=2.0)
 
-            # First, make a "warm-up" request to let the proxy initiate its connection
             proxies = {
                 "http": f"http://127.0.0.1:{http_port}",
                 "https": f"http://127.0.0.1:{http_port}",
             }
-            try:
-                # Warm-up request (ignore result, just to trigger connection)
-                http_get(
-                    "http://gstatic.com/generate_204",
-                    proxies=proxies,
-                    timeout=1,
-                )
-            except Exception:
-                # Ignore any errors in warm-up
-                pass
 
-            # Now measure the ping with the real test request
-            start_time = time.time()
+            # Measure twice and keep the faster one. The first request pays for opening the
+            # connection through the proxy and the remote DNS lookup; the connection then stays
+            # alive in the session for the second.
+            ping_ms = None
             try:
-                response = http_get(
-                    "http://gstatic.com/generate_204",
-                    proxies=proxies,
-                    timeout=test_timeout,
-                )
+                for _ in range(2):
+                    start_ns = time.monotonic_ns()
+                    response = session.get(
+                        CONNECTIVITY_TEST_URL,
+                        proxies=proxies,
+                        headers={"Cache-Control": "no-store"},
+                        timeout=test_timeout,
+                    )
 
-                if response.status_code == 204:
-                    ping_ms = int((time.time() - start_time) * 1000)
-                    return True, ping_ms, None, socks_port, http_port
-                return (
-                    False,
-                    None,
-                    f"HTTP {response.status_code}",
-                    socks_port,
-                    http_port,
-                )
+                    if response.status_code != 204:
+                        return (
+                            False,
+                            None,
+                            f"HTTP {response.status_code}",
+                            socks_port,
+                            http_port,
+                        )
+                    elapsed_ms = (time.monotonic_ns() - start_ns) // 1_000_000
+                    ping_ms = elapsed_ms if ping_ms is None else min(ping_ms, elapsed_ms)
+
+                return True, ping_ms, None, socks_port, http_port
 
             except Timeout:
                 return False, None, "Connection timeout", socks_port, http_port
@@ -942,17 +1284,61 @@ class ProcessManager:
         except Exception as e:
             return False, None, f"Test error: {e!s}", socks_port, http_port
         finally:
-            # Always stop the test server
+            # Always stop the test server, once the last test using it is done
             try:
-                if server_id != self.current_server_id and server_id in self.running_processes:
-                    self.stop_server(server_id)
+                if joined:
+                    self._leave_test_server(server_id)
             except Exception:
                 pass
 
+    def _join_test_server(self, server_id: str, socks_port: int, http_port: int) -> tuple[bool, int, int]:
+        """Count a test of server_id and get the ports to use.
+
+        Returns:
+            Tuple[bool, int, int]: (starter, socks_port, http_port), where starter tells whether
+            this test has to start the server; otherwise the running test server's ports are returned
+
+        """
+        with self._lock:
+            entry = self._test_servers.get(server_id)
+            if entry is None:
+                self._test_servers[server_id] = (1, socks_port, http_port)
+                return True, socks_port, http_port
+            testers, socks_port, http_port = entry
+            self._test_servers[server_id] = (testers + 1, socks_port, http_port)
+            return False, socks_port, http_port
+
+    def _leave_test_server(self, server_id: str) -> None:
+        """Uncount a test of server_id, stopping the test server when it was the last one."""
+        with self._lock:
+            testers, socks_port, http_port = self._test_servers[server_id]
+            if testers > 1:
+                self._test_servers[server_id] = (testers - 1, socks_port, http_port)
+                return
+            del self._test_servers[server_id]
+
+        self._drop_test_proxy(http_port)
+        if server_id != self.current_server_id and server_id in self.running_processes:
+            self.stop_server(server_id)
+
+    def _drop_test_proxy(self, http_port: int) -> None:
+        """Close and forget the session's connection pools through the test proxy on http_port.
+
+        The adapter keeps a proxy manager per proxy URL for good, and every test server listens
+        on a fresh port, so they would pile up over the session's lifetime otherwise.
+        """
+        session = self._test_session
+        if session is None:
+            return
+        proxy_url = f"http://127.0.0.1:{http_port}"
+        manager = session.get_adapter(CONNECTIVITY_TEST_URL).proxy_manager.pop(proxy_url, None)
+        if manager is not None:
+            manager.clear()
+
     def test_subscription_servers(
         self,
         subscription_servers: list,
-        subscription_id: UUID,
+        subscription_id: str,
         test_timeout: int = 6,
     ) -> list[dict]:
         """Test all servers in a subscription in parallel.
@@ -987,20 +1373,10 @@ class ProcessManager:
                     "http_port": 0,
                 }
 
-        results = []
-        # Use ThreadPoolExecutor for parallel testing
-        with ThreadPoolExecutor(max_workers=min(8, len(subscription_servers) or 1)) as executor:
-            future_to_server = {executor.submit(test_one, server): server for server in subscription_servers}
-            for future in as_completed(future_to_server):
-                result = future.result()
-                results.append(result)
-
-        # Optionally, sort results to match input order
-        server_id_to_result = {r["server_id"]: r for r in results}
-        ordered_results = [
-            server_id_to_result.get(server.id) for server in subscription_servers if server_id_to_result.get(server.id)
-        ]
-        return ordered_results
+        # Use ThreadPoolExecutor for parallel testing; map() yields results in input order
+        workers = min(CONNECTIVITY_TEST_WORKERS, len(subscription_servers) or 1)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="nabzram-test") as executor:
+            return list(executor.map(test_one, subscription_servers))
 
 
 # Global process manager instance
@@ -1,14 +1,16 @@
 """Subscription management service."""
 
 import logging
-from copy import deepcopy
+import re
+from collections import defaultdict, deque
 from datetime import UTC, datetime
-from json import JSONDecodeError
+from http import HTTPStatus
+from json import JSONDecodeError, loads
+from types import MappingProxyType
 from typing import Any
-from urllib.parse import urljoin
-from uuid import uuid4
 
 from requests import Session
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError, RequestException
 
 from app.models.database import ServerModel, SubscriptionModel, SubscriptionUserInfo
@@ -16,13 +18,45 @@ from app.models.schemas import SubscriptionCreate
 
 logger = logging.getLogger(__name__)
 
+# Config keys that may hold a server's display name; "ps" is the V2Ray share link format
+_REMARKS_KEYS = ("remarks", "ps", "name", "tag")
+# The numeric fields of a subscription-userinfo header
+_USERINFO_RE = re.compile(r"(upload|download|total|expire)\s*=\s*(\d+)")
+# Path endings of subscription URLs that already serve JSON configs
+_JSON_ENDPOINTS = ("/v2ray-json", "/v2ray", "/json")
+
+
+def _server_address(config: dict[str, Any]) -> str:
+    """Get the address of a config's first outbound, or "" if it has none."""
+    outbounds = config.get("outbounds")
+    if not outbounds or not isinstance(outbounds, list) or not isinstance(outbounds[0], dict):
+        return ""
+    settings = outbounds[0].get("settings")
+    if not isinstance(settings, dict):
+        return ""
+    # vmess/vless list their endpoints under vnext, trojan/shadowsocks under servers
+    endpoints = settings.get("vnext") or settings.get("servers")
+    if not endpoints or not isinstance(endpoints, list) or not isinstance(endpoints[0], dict):
+        return ""
+    return str(endpoints[0].get("address", ""))
+
+
+def _take(servers: dict[Any, deque[ServerModel]], key: Any) -> ServerModel | None:
+    """Remove and return the first server queued under key, if any."""
+    queue = servers.get(key)
+    return queue.popleft() if queue else None
+
 
 class SubscriptionService:
     """Service for managing proxy subscriptions."""
 
-    def __init__(self) -> None:
+    def __init__(self, timeout: float = 30.0, pool_size: int = 10) -> None:
+        self.timeout = timeout
+        # Keep connections to subscription hosts alive between refreshes
+        adapter = HTTPAdapter(pool_maxsize=pool_size)
         self.session = Session()
-        self.session.timeout = 30.0
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
     def close(self) -> None:
         """Close HTTP session."""
@@ -30,11 +64,11 @@ class SubscriptionService:
 
     def _normalize_url(self, url: str) -> str:
         """Normalize subscription URL by appending /v2ray-json if missing."""
-        url = str(url).rstrip("/")
+        url = url.rstrip("/")
 
-        # Check if URL already ends with v2ray-json or similar
-        if not any(endpoint in url.lower() for endpoint in ["/v2ray-json", "/v2ray", "/json"]):
-            url = urljoin(url + "/", "v2ray-json")
+        # Check if URL already ends with v2ray-json or similar; the trailing slash is already gone
+        if not url.lower().endswith(_JSON_ENDPOINTS):
+            url = f"{url}/v2ray-json"
 
         return url
 
@@ -50,13 +84,8 @@ class SubscriptionService:
         - expire = UTC timestamp (0 means no expiry, should be None)
         """
         try:
-            # Parse key-value pairs separated by semicolons
-            pairs = {}
-            for part in userinfo_header.split(";"):
-                part = part.strip()
-                if "=" in part:
-                    key, value = part.split("=", 1)
-                    pairs[key.strip()] = value.strip()
+            # Pick the known key=value pairs out of the header in one pass
+            pairs = dict(_USERINFO_RE.findall(userinfo_header))
 
             # Extract values
             upload = int(pairs.get("upload", 0))
@@ -89,10 +118,27 @@ class SubscriptionService:
     def fetch_subscription_config(
         self,
         url: str,
-    ) -> tuple[list[dict[str, Any]], SubscriptionUserInfo | None]:
-        """Fetch and parse subscription configuration and user info."""
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> tuple[list[dict[str, Any]] | None, SubscriptionUserInfo | None, dict[str, str | None]]:
+        """Fetch and parse subscription configuration and user info.
+
+        When etag/last_modified are given the request is conditional, and configs
+        is None if the server answers 304 Not Modified.
+
+        Returns:
+            tuple: (configs, user_info, validators) where validators holds the
+            response's "etag" and "last_modified" headers
+
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
         try:
-            response = self.session.get(url)
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
             response.raise_for_status()
 
             # Parse subscription-userinfo header if present
@@ -101,10 +147,18 @@ class SubscriptionService:
             if userinfo_header:
                 user_info = self._parse_subscription_userinfo(userinfo_header)
 
-            # Try to parse as JSON
+            validators = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+            if response.status_code == HTTPStatus.NOT_MODIFIED:
+                return None, user_info, validators
+
+            # Try to parse as JSON, straight from the body bytes; json detects the UTF encoding
+            # itself, so requests doesn't have to guess a charset and decode to text first
             try:
-                config_data = response.json()
-            except JSONDecodeError:
+                config_data = loads(response.content)
+            except (JSONDecodeError, UnicodeDecodeError):
                 # If not JSON, might be base64 encoded or other format
                 msg = "Invalid subscription format: not valid JSON"
                 raise ValueError(msg)
@@ -125,7 +179,7 @@ class SubscriptionService:
                 msg = "Invalid subscription format: unexpected data structure"
                 raise ValueError(msg)
 
-            return configs, user_info
+            return configs, user_info, validators
 
         except HTTPError:
             msg = f"HTTP error {response.status_code}: {response.text}"
@@ -139,24 +193,19 @@ class SubscriptionService:
         config: dict[str, Any],
     ) -> tuple[str, dict[str, Any]]:
         """Extract server remarks and clean config."""
-        # Try to find remarks in various possible locations
-        remarks = "Unknown Server"
-
-        # Common locations for server names/remarks
-        if "remarks" in config:
-            remarks = config["remarks"]
-        elif "ps" in config:  # V2Ray format
-            remarks = config["ps"]
-        elif "name" in config:
-            remarks = config["name"]
-        elif "tag" in config:
-            remarks = config["tag"]
-        elif isinstance(config.get("outbounds"), list) and len(config["outbounds"]) > 0:
-            outbound = config["outbounds"][0]
-            if "tag" in outbound:
-                remarks = outbound["tag"]
-
-        return remarks, config
+        # Common locations for server names/remarks, in order of preference
+        for key in _REMARKS_KEYS:
+            remarks = config.get(key)
+            if remarks is not None:
+                return str(remarks), config
+
+        outbounds = config.get("outbounds")
+        if isinstance(outbounds, list) and outbounds and isinstance(outbounds[0], dict):
+            remarks = outbounds[0].get("tag")
+            if remarks is not None:
+                return str(remarks), config
+
+        return "Unknown Server", config
 
     def _apply_port_overrides(
         self,
@@ -168,17 +217,26 @@ class SubscriptionService:
         if not config.get("inbounds"):
             return config
 
-        modified_config = deepcopy(config)
-
-        for inbound in modified_config.get("inbounds", []):
+        # Only the inbounds whose port changes are copied, the rest of the config is shared
+        inbounds = list(config["inbounds"])
+        changed = False
+        for i, inbound in enumerate(inbounds):
             tag = inbound.get("tag", "").lower()
 
             if socks_port and "socks" in tag:
-                inbound["port"] = socks_port
+                port = socks_port
             elif http_port and "http" in tag:
-                inbound["port"] = http_port
+                port = http_port
+            else:
+                continue
+
+            if inbound.get("port") != port:
+                inbounds[i] = {**inbound, "port": port}
+                changed = True
 
-        return modified_config
+        if not changed:
+            return config
+        return {**config, "inbounds": inbounds}
 
     def create_subscription(
         self,
@@ -191,9 +249,11 @@ class SubscriptionService:
         normalized_url = self._normalize_url(str(subscription_data.url))
 
         # Fetch subscription configuration and user info
-        configs, user_info = self.fetch_subscription_config(normalized_url)
+        configs, user_info, validators = self.fetch_subscription_config(normalized_url)
 
-        # Create server models from configs
+        # Create server models from configs. The configs were just parsed from JSON and remarks
+        # is always a str, so the models are built without validating every raw config again,
+        # only wrapped read-only as validation would do.
         servers = []
         for config in configs:
             remarks, clean_config = self._extract_server_info(config)
@@ -206,22 +266,22 @@ class SubscriptionService:
                     http_port,
                 )
 
-            server = ServerModel(
-                id=uuid4(),
+            server = ServerModel.model_construct(
                 remarks=remarks,
-                raw=clean_config,
+                raw=MappingProxyType(clean_config),
                 status="stopped",
             )
             servers.append(server)
 
         # Create subscription model
-        return SubscriptionModel(
-            id=uuid4(),
+        return SubscriptionModel.model_construct(
             name=subscription_data.name,
             url=normalized_url,
             servers=servers,
             last_updated=datetime.now(),
             user_info=user_info,
+            etag=validators["etag"],
+            last_modified=validators["last_modified"],
         )
 
     def update_subscription_servers(
@@ -230,14 +290,23 @@ class SubscriptionService:
         socks_port: int | None = None,
         http_port: int | None = None,
     ) -> SubscriptionModel:
-        """Update servers for an existing subscription."""
-        # Fetch fresh configuration and user info
-        configs, user_info = self.fetch_subscription_config(subscription.url)
+        """Update servers for an existing subscription.
 
-        # Create new server models
-        new_servers = []
-        existing_servers_by_remarks = {server.remarks: server for server in subscription.servers}
+        Returns the given subscription object itself if the upstream content and
+        user info are unchanged, so callers can skip saving it.
+        """
+        # Fetch fresh configuration and user info, unless it hasn't changed since the last fetch
+        configs, user_info, validators = self.fetch_subscription_config(
+            subscription.url,
+            subscription.etag,
+            subscription.last_modified,
+        )
+        if configs is None:
+            if user_info is None or user_info == subscription.user_info:
+                return subscription
+            return subscription.model_copy(update={"user_info": user_info})
 
+        entries = []
         for config in configs:
             remarks, clean_config = self._extract_server_info(config)
 
@@ -248,29 +317,49 @@ class SubscriptionService:
                     socks_port,
                     http_port,
                 )
+            entries.append((remarks, _server_address(clean_config), clean_config))
+
+        # Try to preserve existing server IDs and status, giving each existing server to one entry.
+        # Match remarks and address first, so servers sharing a name keep their own IDs, then
+        # remarks alone for whatever is left, e.g. a server whose address changed.
+        existing_by_key = defaultdict(deque)
+        for server in subscription.servers:
+            existing_by_key[server.remarks, _server_address(server.raw)].append(server)
+        matches = [_take(existing_by_key, (remarks, address)) for remarks, address, _ in entries]
+
+        existing_by_remarks = defaultdict(deque)
+        for servers in existing_by_key.values():
+            for server in servers:
+                existing_by_remarks[server.remarks].append(server)
+        for i, (remarks, _, _) in enumerate(entries):
+            if matches[i] is None:
+                matches[i] = _take(existing_by_remarks, remarks)
 
-            # Try to preserve existing server ID and status if server exists
-            existing_server = existing_servers_by_remarks.get(remarks)
+        # Create new server models
+        new_servers = []
+        for (remarks, _, clean_config), existing_server in zip(entries, matches, strict=True):
             if existing_server:
-                server = ServerModel(
+                server = ServerModel.model_construct(
                     id=existing_server.id,
                     remarks=remarks,
-                    raw=clean_config,
+                    raw=MappingProxyType(clean_config),
                     status=existing_server.status,  # Preserve status
                 )
             else:
-                server = ServerModel(
-                    id=uuid4(),
+                server = ServerModel.model_construct(
                     remarks=remarks,
-                    raw=clean_config,
+                    raw=MappingProxyType(clean_config),
                     status="stopped",
                 )
 
             new_servers.append(server)
 
-        # Update subscription
-        subscription.servers = new_servers
-        subscription.last_updated = datetime.now()
-        subscription.user_info = user_info
-
-        return subscription
+        return subscription.model_copy(
+            update={
+                "servers": new_servers,
+                "last_updated": datetime.now(),
+                "user_info": user_info,
+                "etag": validators["etag"],
+                "last_modified": validators["last_modified"],
+            },
+        )
@@ -0,0 +1,92 @@
+"""Background task runner for long-running operations."""
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+# Finished tasks whose status is never read are dropped after this many seconds
+FINISHED_TASK_TTL = 600.0
+
+
+class TaskConflictError(RuntimeError):
+    """A task of the same kind is already running with different arguments."""
+
+
+class TaskRegistry:
+    """Runs callables on a small worker pool and tracks them by task id."""
+
+    def __init__(self, max_workers: int = 2, finished_ttl: float = FINISHED_TASK_TTL) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nabzram-task")
+        self._finished_ttl = finished_ttl
+        self._tasks: dict[str, Future] = {}
+        # kind -> (id, arguments) of the unfinished task of that kind
+        self._running: dict[str, tuple[str, tuple[Any, ...]]] = {}
+        # task id -> monotonic time it finished at
+        self._finished: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable[..., Any], *args: Any, kind: str | None = None, **kwargs: Any) -> str:
+        """Start func in the background and return its task id.
+
+        If kind is given, only one task of that kind runs at a time: while one is running,
+        a submit with the same arguments gets its id, and one with other arguments
+        raises TaskConflictError.
+        """
+        call = (args, kwargs)
+        with self._lock:
+            self._evict_expired()
+            if kind is not None and kind in self._running:
+                running_id, running_call = self._running[kind]
+                if running_call != call:
+                    msg = f"A task of kind {kind!r} is already running"
+                    raise TaskConflictError(msg)
+                return running_id
+            task_id = uuid4().hex
+            future = self._executor.submit(func, *args, **kwargs)
+            self._tasks[task_id] = future
+            if kind is not None:
+                self._running[kind] = (task_id, call)
+        # Outside the lock, the callback runs right away if the task is already done
+        future.add_done_callback(lambda f: self._on_done(task_id, kind, f))
+        return task_id
+
+    def get(self, task_id: str) -> Future | None:
+        """Get the future of a task, or None if the id is unknown."""
+        with self._lock:
+            self._evict_expired()
+            return self._tasks.get(task_id)
+
+    def forget(self, task_id: str) -> None:
+        """Drop a finished task once its result has been handed out."""
+        with self._lock:
+            self._tasks.pop(task_id, None)
+            self._finished.pop(task_id, None)
+
+    def _evict_expired(self) -> None:
+        """Drop finished tasks nobody asked about for longer than the TTL; the lock must be held."""
+        deadline = time.monotonic() - self._finished_ttl
+        for task_id in [task_id for task_id, done_at in self._finished.items() if done_at < deadline]:
+            del self._finished[task_id]
+            self._tasks.pop(task_id, None)
+
+    def _on_done(self, task_id: str, kind: str | None, future: Future) -> None:
+        with self._lock:
+            running = self._running.get(kind) if kind is not None else None
+            if running is not None and running[0] == task_id:
+                del self._running[kind]
+            if task_id in self._tasks:
+                self._finished[task_id] = time.monotonic()
+
+        exc = None if future.cancelled() else future.exception()
+        if exc is not None:
+            logger.error("Background task %s failed", task_id, exc_info=exc)
+
+
+# Global task registry instance
+task_registry = TaskRegistry(max_workers=2)
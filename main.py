@@ -3,6 +3,7 @@ from settings import APP_ROOT
 
 if __name__ == "__main__":
     gui = GuiManager()
+    gui.prewarm()
 
     ui_dir = APP_ROOT / "ui/dist/index.html"
     window = gui.create_main_window(str(ui_dir))
@@ -0,0 +1,37 @@
+"""Tests for the GUI package layout."""
+
+import ast
+import importlib
+import unittest
+from pathlib import Path
+
+import app
+import app.gui
+from app.gui.ops_api import OperationsApi
+
+APP_DIR = Path(app.__file__).parent
+
+
+def _class_definitions(name: str) -> list[Path]:
+    """Get the source files under app/, once per definition of a class called name."""
+    found = []
+    for path in APP_DIR.rglob("*.py"):
+        tree = ast.parse(path.read_text(encoding="utf-8"))
+        found += [path for node in ast.walk(tree) if isinstance(node, ast.ClassDef) and node.name == name]
+    return found
+
+
+class SingleDefinitionTests(unittest.TestCase):
+    """GuiManager and OperationsApi exist exactly once."""
+
+    def test_gui_manager_resolves_to_one_class(self) -> None:
+        self.assertEqual(_class_definitions("GuiManager"), [APP_DIR / "gui" / "__init__.py"])
+        self.assertEqual(id(importlib.import_module("app.gui").GuiManager), id(app.gui.GuiManager))
+
+    def test_operations_api_resolves_to_one_class(self) -> None:
+        self.assertEqual(_class_definitions("OperationsApi"), [APP_DIR / "gui" / "ops_api.py"])
+        self.assertIs(app.gui.OperationsApi, OperationsApi)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+"""Tests for the TinyDB database manager."""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from app.database.tinydb_manager import DatabaseManager
+from app.models.database import ServerModel, SubscriptionModel
+
+
+class ServerRawTests(unittest.TestCase):
+    """Server configs read back from the database."""
+
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(str(Path(self._tmp.name) / "db.json"))
+        self.raw = {"outbounds": [{"tag": "proxy", "settings": {"vnext": [{"address": "example.com"}]}}]}
+        self.subscription = SubscriptionModel(
+            name="test",
+            url="https://example.com/sub",
+            servers=[ServerModel(remarks="server", raw=self.raw)],
+        )
+        self.db.create_subscription(self.subscription)
+        self.server_id = self.subscription.servers[0].id
+
+    def tearDown(self) -> None:
+        self.db.close()
+        self._tmp.cleanup()
+
+    def test_returned_raw_is_read_only(self) -> None:
+        server = self.db.get_server(self.subscription.id, self.server_id)
+        with self.assertRaises(TypeError):
+            server.raw["inbounds"] = []
+
+        server = self.db.get_server(self.subscription.id, self.server_id)
+        self.assertEqual(server.raw, self.raw)
+
+    def test_raw_survives_a_rewrite_of_its_subscription(self) -> None:
+        self.db.update_server_status(self.subscription.id, self.server_id, "running")
+
+        server = self.db.get_server(self.subscription.id, self.server_id)
+        self.assertEqual(server.status, "running")
+        self.assertEqual(server.raw, self.raw)
+        self.assertEqual(type(server.model_dump()["raw"]), dict)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,6 +13,7 @@ import {
     XrayUpdateRequest,
     XrayUpdateResponse,
     GeodataUpdateResponse,
+    UpdateTaskResponse,
     SubscriptionCreateResponse,
     SubscriptionUpdateResponse,
     SubscriptionDeleteResponse,
@@ -58,13 +59,14 @@ interface PywebviewApi {
 
     // Settings
     get_settings: () => Promise<SettingsResponse>;
-    update_settings: (payload: SettingsUpdate) => Promise<SettingsUpdateResponse>;
+    update_settings: (payload: SettingsUpdate | string) => Promise<SettingsUpdateResponse>;
 
     // Subscriptions
     list_subscriptions: () => Promise<Subscription[]>;
+    list_subscriptions_page: (limit?: number, cursor?: string | null) => Promise<{ items: Subscription[]; next_cursor: string | null }>;
     get_subscription: (subscription_id: string) => Promise<SubscriptionDetail>;
-    create_subscription: (payload: SubscriptionCreate) => Promise<SubscriptionCreateResponse>;
-    update_subscription: (subscription_id: string, payload: SubscriptionUpdate) => Promise<SubscriptionUpdateResponse>;
+    create_subscription: (payload: SubscriptionCreate | string) => Promise<SubscriptionCreateResponse>;
+    update_subscription: (subscription_id: string, payload: SubscriptionUpdate | string) => Promise<SubscriptionUpdateResponse>;
     delete_subscription: (subscription_id: string) => Promise<SubscriptionDeleteResponse>;
     refresh_subscription_servers: (subscription_id: string) => Promise<SubscriptionRefreshResponse>;
 
@@ -79,8 +81,9 @@ interface PywebviewApi {
 
     // Updates
     get_xray_version_info: () => Promise<XrayVersionInfo>;
-    update_xray: (payload: XrayUpdateRequest) => Promise<XrayUpdateResponse>;
-    update_geodata: () => Promise<GeodataUpdateResponse>;
+    update_xray: (payload: XrayUpdateRequest) => Promise<UpdateTaskResponse>;
+    update_geodata: () => Promise<UpdateTaskResponse>;
+    get_update_status: (task_id: string) => Promise<UpdateTaskResponse | XrayUpdateResponse | GeodataUpdateResponse>;
 
     // Logs
     get_log_snapshot: (limit?: number) => Promise<any>;
@@ -88,7 +91,7 @@ interface PywebviewApi {
 
     // Appearance
     get_appearance: () => Promise<AppearanceResponse>;
-    update_appearance: (payload: AppearanceUpdate) => Promise<AppearanceUpdateResponse>;
+    update_appearance: (payload: AppearanceUpdate | string) => Promise<AppearanceUpdateResponse>;
 }
 
 interface FrontendApi {
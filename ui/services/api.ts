@@ -14,6 +14,7 @@ import {
     XrayUpdateRequest,
     XrayUpdateResponse,
     GeodataUpdateResponse,
+    UpdateTaskResponse,
     SubscriptionCreateResponse,
     SubscriptionUpdateResponse,
     SubscriptionDeleteResponse,
@@ -83,11 +84,11 @@ export async function getSubscriptionDetails(id: string): Promise<SubscriptionDe
 }
 
 export async function createSubscription(data: SubscriptionCreate): Promise<SubscriptionCreateResponse> {
-    return callApp('create_subscription', data);
+    return callApp('create_subscription', JSON.stringify(data));
 }
 
 export async function updateSubscription(id: string, data: SubscriptionUpdate): Promise<SubscriptionUpdateResponse> {
-    return callApp('update_subscription', id, data);
+    return callApp('update_subscription', id, JSON.stringify(data));
 }
 
 export async function deleteSubscription(id: string): Promise<SubscriptionDeleteResponse> {
@@ -115,7 +116,7 @@ export async function getSettings(): Promise<SettingsResponse> {
 }
 
 export async function updateSettings(data: SettingsUpdate): Promise<SettingsUpdateResponse> {
-    return callApp('update_settings', data);
+    return callApp('update_settings', JSON.stringify(data));
 }
 
 export async function testSubscriptionServers(id: string): Promise<SubscriptionUrlTestResponse> {
@@ -130,12 +131,24 @@ export async function getXrayVersionInfo(): Promise<XrayVersionInfo> {
     return callApp<XrayVersionInfo>('get_xray_version_info');
 }
 
+// Updates run as background tasks on the Python side; poll until the task finishes.
+async function runUpdateTask<T>(method: string, ...args: any[]): Promise<T> {
+    const task = await callApp<UpdateTaskResponse>(method, ...args);
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, 500));
+        const res = await callApp<UpdateTaskResponse>('get_update_status', task.task_id);
+        if (res.status !== 'in_progress') {
+            return res as unknown as T;
+        }
+    }
+}
+
 export async function updateXray(data: XrayUpdateRequest): Promise<XrayUpdateResponse> {
-    return callApp<XrayUpdateResponse>('update_xray', data);
+    return runUpdateTask<XrayUpdateResponse>('update_xray', data);
 }
 
 export async function updateGeodata(): Promise<GeodataUpdateResponse> {
-    return callApp<GeodataUpdateResponse>('update_geodata');
+    return runUpdateTask<GeodataUpdateResponse>('update_geodata');
 }
 
 export async function getLogSnapshot(limit?: number): Promise<LogSnapshotResponse> {
@@ -151,5 +164,5 @@ export async function getAppearance(): Promise<AppearanceResponse> {
 }
 
 export async function updateAppearance(data: AppearanceUpdate): Promise<AppearanceUpdateResponse> {
-    return callApp('update_appearance', data);
+    return callApp('update_appearance', JSON.stringify(data));
 }
\ No newline at end of file
@@ -130,6 +130,12 @@ export interface GeodataUpdateResponse {
     assets_folder: string;
 }
 
+export interface UpdateTaskResponse {
+    message: string;
+    status: 'in_progress' | 'done' | 'error';
+    task_id: string;
+}
+
 export interface SubscriptionCreateResponse {
   message: string;
   id: string;
@@ -175,6 +181,7 @@ export interface SettingsUpdateResponse extends SettingsResponse {
 
 export interface LogEntry {
   timestamp: string; // ISO datetime
+  epoch_ms: number; // same instant as timestamp, in Unix milliseconds
   message: string;
 }
 